@@ -0,0 +1,50 @@
+import json
+import os
+
+# Hardcoded wallet addresses to track
+HARDCODED_WALLETS = [
+    {'address': '0x16b29c50f2439faf627209b2ac0c7bbddaa8a881', 'label': 'Freedom'},
+    #{'address': '0xee613b3fc183ee44f9da9c05f53e2da107e3debf', 'label': 'Quantbet'},#
+    {'address': '0x91654fd592ea5339fc0b1b2f2b30bfffa5e75b98', 'label': 'ST'},
+    {'address': '0x6a72f61820b26b1fe4d956e17b6dc2a1ea3033ee', 'label': 'Kyle/Ray'},
+    {'address': '0x14964aefa2cd7caff7878b3820a690a03c5aa429', 'label': 'GMPM'},
+    {'address': '0x2c57db9e442ef5ffb2651f03afd551171738c94d', 'label': 'ZeroOptimist'},
+    {'address': '0x9f138019d5481fdc5c59b93b0ae4b9b817cce0fd', 'label': 'Bienville'},
+    # Add more wallets here as needed
+    # {'address': '0x...', 'label': 'WalletName'},
+]
+
+# File to store wallet addresses (for additional wallets added via UI)
+DATA_DIR = os.path.expanduser('~/.sharpscout')
+WALLETS_FILE = os.path.join(DATA_DIR, 'wallets.json')
+
+# Shared store written by polling workers (sqlite path or redis:// URL)
+STORE_URL = os.environ.get('SHARPSCOUT_STORE_URL', os.path.join(DATA_DIR, 'sharpscout.db'))
+
+# Warm caches on server start and keep upcoming markets fresh in the background (see prefetch.py)
+PREFETCH_ENABLED = os.environ.get('SHARPSCOUT_PREFETCH', '1') != '0'
+
+# Create data directory if it doesn't exist
+os.makedirs(DATA_DIR, exist_ok=True)
+
+def load_wallets():
+    """Load wallet addresses - combines hardcoded and file wallets"""
+    wallets = HARDCODED_WALLETS.copy()
+
+    # Add wallets from file that aren't already in hardcoded list
+    if os.path.exists(WALLETS_FILE):
+        with open(WALLETS_FILE, 'r') as f:
+            file_wallets_data = json.load(f)
+            # Convert old format (list of strings) to new format (list of dicts)
+            if file_wallets_data and isinstance(file_wallets_data[0], str):
+                file_wallets = [{'address': addr, 'label': ''} for addr in file_wallets_data]
+            else:
+                file_wallets = file_wallets_data
+
+            # Add file wallets that aren't already in hardcoded list
+            hardcoded_addresses = {w['address'].lower() for w in HARDCODED_WALLETS}
+            for wallet in file_wallets:
+                if wallet.get('address', '').lower() not in hardcoded_addresses:
+                    wallets.append(wallet)
+
+    return wallets
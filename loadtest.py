@@ -0,0 +1,256 @@
+"""Concurrent-viewer load test for the dashboard.
+
+Starts a fake Polymarket API in a separate process, points the app at it and
+runs N simulated dashboard sessions (Streamlit AppTest) concurrently in this
+process, which shares Streamlit's caches the way one server instance does.
+Reports per-session latency percentiles, upstream request amplification and
+the app's CPU and peak memory.
+
+Sessions track the configured wallets plus --wallets synthetic ones, written
+to a throwaway HOME so the server's warm-up/prefetch sees the same list.
+
+    python loadtest.py --sessions 20 --wallets 6
+    python loadtest.py --sessions 50 --reruns 3 --upstream-latency 150
+    python loadtest.py --sessions 20 --no-prefetch   # cold-cache baseline
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import resource
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+APP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'streamlit_app.py')
+
+def condition_id_for(index):
+    return '0x' + hashlib.sha1(f"market-{index}".encode('utf-8')).hexdigest()
+
+def fake_trades(wallet_address, markets_per_wallet, market_pool):
+    """Deterministic trades for a wallet, spread over a shared pool of markets"""
+    seed = int(hashlib.sha1(wallet_address.lower().encode('utf-8')).hexdigest(), 16)
+    now = int(time.time())
+    trades = []
+    for n in range(markets_per_wallet):
+        index = (seed + n * 7) % market_pool
+        event_date = (datetime.now() + timedelta(days=index % 3)).strftime('%Y-%m-%d')
+        for k, side in enumerate(('BUY', 'BUY', 'SELL')):
+            trades.append({
+                'proxyWallet': wallet_address,
+                'conditionId': condition_id_for(index),
+                'title': f"Fake market {index}",
+                'eventSlug': f"nba-t{index % 10}-t{(index + 1) % 10}-{event_date}",
+                'outcome': 'Yes' if (seed + index) % 2 else 'No',
+                'side': side,
+                'size': 10 + k * 5,
+                'price': 0.4 + k * 0.05,
+                'timestamp': now - 3600 * (n + 1) + k * 60,
+                'transactionHash': f"0x{seed % 10**8:08x}{index:04d}{k}",
+            })
+    trades.sort(key=lambda trade: -trade['timestamp'])
+    return trades
+
+def fake_clob_market(condition_index):
+    """CLOB market payload - every tenth market is resolved"""
+    resolved = condition_index % 10 == 0
+    yes_price = 0.99 if resolved else 0.3 + (condition_index % 5) * 0.1
+    return {
+        'question': f"Fake market {condition_index}",
+        'end_date_iso': datetime.now().strftime('%Y-%m-%dT23:00:00Z'),
+        'closed': resolved,
+        'accepting_orders': not resolved,
+        'tokens': [
+            {'outcome': 'Yes', 'price': yes_price},
+            {'outcome': 'No', 'price': round(1 - yes_price, 2)},
+        ],
+    }
+
+def run_fake_server(port_queue, markets_per_wallet, market_pool, latency):
+    """Serve /trades, /markets, /events and /__stats until the process is terminated"""
+    lock = threading.Lock()
+    counts = {'total': 0, 'by_path': {}, 'unique': set()}
+    condition_index = {condition_id_for(i): i for i in range(market_pool)}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            parsed = urlparse(self.path)
+            query = parse_qs(parsed.query)
+            if parsed.path == '/__stats':
+                with lock:
+                    body = {
+                        'total': counts['total'],
+                        'unique': len(counts['unique']),
+                        'by_path': dict(counts['by_path'])
+                    }
+                return self.send_json(body)
+
+            kind = 'clob_market' if parsed.path.startswith('/markets/') else parsed.path
+            with lock:
+                counts['total'] += 1
+                counts['by_path'][kind] = counts['by_path'].get(kind, 0) + 1
+                counts['unique'].add(self.path)
+            if latency:
+                time.sleep(latency)
+
+            if parsed.path == '/trades':
+                offset = int(query.get('offset', ['0'])[0])
+                limit = int(query.get('limit', ['100'])[0])
+                trades = fake_trades(query.get('user', [''])[0], markets_per_wallet, market_pool)
+                return self.send_json(trades[offset:offset + limit])
+            if parsed.path.startswith('/markets/'):
+                index = condition_index.get(parsed.path.rsplit('/', 1)[1])
+                if index is None:
+                    return self.send_json({}, status=404)
+                return self.send_json(fake_clob_market(index))
+            return self.send_json([])
+
+        def send_json(self, body, status=200):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    port_queue.put(server.server_port)
+    server.serve_forever()
+
+def fake_wallets(count):
+    return [
+        {'address': '0x' + hashlib.sha1(f"wallet-{i}".encode('utf-8')).hexdigest()[:40], 'label': f"W{i}"}
+        for i in range(count)
+    ]
+
+def run_session(reruns, timeout):
+    """One simulated viewer: initial page load plus reruns - returns per-run latencies"""
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(APP_FILE, default_timeout=timeout)
+    latencies = []
+    errors = 0
+    for _ in range(1 + reruns):
+        started = time.perf_counter()
+        app.run()
+        latencies.append(time.perf_counter() - started)
+        errors += len(app.exception)
+    return latencies, errors
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+def fetch_upstream_stats(base_url):
+    import requests
+    return requests.get(f"{base_url}/__stats", timeout=5).json()
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate concurrent dashboard viewers against a fake Polymarket API")
+    parser.add_argument('--sessions', type=int, default=10, help="concurrent dashboard sessions")
+    parser.add_argument('--reruns', type=int, default=0, help="extra reruns per session after the first page load")
+    parser.add_argument('--wallets', type=int, default=6, help="synthetic wallets added to the configured ones")
+    parser.add_argument('--markets-per-wallet', type=int, default=20)
+    parser.add_argument('--market-pool', type=int, default=40, help="distinct markets shared by all wallets")
+    parser.add_argument('--upstream-latency', type=float, default=50, help="fake API latency in ms")
+    parser.add_argument('--timeout', type=float, default=120, help="seconds before a session run is abandoned")
+    parser.add_argument('--no-prefetch', action='store_true', help="disable the server warm-up/prefetcher")
+    parser.add_argument('--json', action='store_true', help="print results as JSON")
+    args = parser.parse_args()
+
+    port_queue = multiprocessing.Queue()
+    server = multiprocessing.Process(
+        target=run_fake_server,
+        args=(port_queue, args.markets_per_wallet, args.market_pool, args.upstream_latency / 1000),
+        daemon=True
+    )
+    server.start()
+    base_url = f"http://127.0.0.1:{port_queue.get(timeout=10)}"
+
+    # Must be set before the app (and config/polymarket_api) is first imported
+    home = tempfile.mkdtemp(prefix='sharpscout-loadtest-')
+    os.environ['HOME'] = home
+    os.environ['POLYMARKET_DATA_API_URL'] = base_url
+    os.environ['POLYMARKET_CLOB_API_URL'] = base_url
+    os.environ['SHARPSCOUT_STORE_URL'] = os.path.join(home, 'store.db')
+    os.environ['SHARPSCOUT_PREFETCH'] = '0' if args.no_prefetch else '1'
+
+    os.makedirs(os.path.join(home, '.sharpscout'))
+    with open(os.path.join(home, '.sharpscout', 'wallets.json'), 'w') as f:
+        json.dump(fake_wallets(args.wallets), f)
+
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+        futures = [pool.submit(run_session, args.reruns, args.timeout) for _ in range(args.sessions)]
+        results = [future.result() for future in futures]
+
+    wall_seconds = time.perf_counter() - started
+    usage_after = resource.getrusage(resource.RUSAGE_SELF)
+    upstream = fetch_upstream_stats(base_url)
+    server.terminate()
+
+    first_loads = [latencies[0] for latencies, _ in results]
+    all_runs = [latency for latencies, _ in results for latency in latencies]
+    cpu_seconds = (usage_after.ru_utime - usage_before.ru_utime) + (usage_after.ru_stime - usage_before.ru_stime)
+
+    report = {
+        'sessions': args.sessions,
+        'runs': len(all_runs),
+        'errors': sum(errors for _, errors in results),
+        'wall_seconds': wall_seconds,
+        'first_load_latency': {
+            'p50': percentile(first_loads, 50),
+            'p90': percentile(first_loads, 90),
+            'p99': percentile(first_loads, 99),
+            'max': max(first_loads),
+        },
+        'all_runs_latency': {
+            'p50': percentile(all_runs, 50),
+            'p90': percentile(all_runs, 90),
+            'p99': percentile(all_runs, 99),
+            'mean': statistics.mean(all_runs),
+        },
+        'upstream_requests': upstream['total'],
+        'upstream_unique_requests': upstream['unique'],
+        'upstream_requests_per_session': upstream['total'] / args.sessions,
+        # 1.0 means every distinct upstream call was made once no matter how many viewers
+        'upstream_amplification': upstream['total'] / upstream['unique'] if upstream['unique'] else 0,
+        'upstream_by_endpoint': upstream['by_path'],
+        'cpu_seconds': cpu_seconds,
+        'cpu_utilization': cpu_seconds / wall_seconds if wall_seconds else 0,
+        'peak_rss_mb': usage_after.ru_maxrss / 1024,  # ru_maxrss is KB on Linux
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"Sessions: {report['sessions']} ({report['runs']} runs, {report['errors']} errors) in {wall_seconds:.2f}s")
+    for name in ('first_load_latency', 'all_runs_latency'):
+        print(f"{name.replace('_', ' ').capitalize()}: " + ', '.join(f"{k} {v * 1000:.0f} ms" for k, v in report[name].items()))
+    print(f"Upstream requests: {report['upstream_requests']} total, {report['upstream_unique_requests']} unique, "
+          f"{report['upstream_requests_per_session']:.1f} per session, amplification {report['upstream_amplification']:.2f}x")
+    print(f"Upstream by endpoint: {report['upstream_by_endpoint']}")
+    print(f"CPU: {cpu_seconds:.2f}s ({report['cpu_utilization']:.0%} of one core), peak RSS {report['peak_rss_mb']:.0f} MB")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+from bisect import bisect_right, insort
+from datetime import datetime, timedelta, timezone
+
+def parse_start_time(value):
+    """UTC datetime from an ISO timestamp or YYYY-MM-DD date, or None"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+class MarketIndex:
+    """Markets keyed by condition_id, grouped into events by eventSlug.
+
+    Built once from the fetched trades so lookups like "all wallet exposure on
+    this game" or "events starting in the next N hours" don't rescan trades.
+    Event start times are kept sorted for range queries. An event starts at its
+    markets' game_start_time, or at midnight UTC of its slug date when no
+    kick-off time is known.
+    """
+
+    def __init__(self):
+        self.markets = {}  # condition_id -> market dict
+        self.events = {}  # event_slug -> {'event_slug', 'start_time', 'slug_date', 'info_start', 'condition_ids'}
+        self.positions = {}  # condition_id -> {wallet_label: position}
+        self._event_starts = []  # sorted (start_time, event_slug)
+
+    def add_trade(self, trade):
+        """Register the market (and its event) a trade belongs to"""
+        condition_id = trade.get('condition_id') or trade.get('conditionId') or trade.get('market')
+        if not condition_id or condition_id in self.markets:
+            return
+        event_slug = trade.get('eventSlug') or condition_id
+        self.markets[condition_id] = {
+            'condition_id': condition_id,
+            'name': trade.get('market_name') or trade.get('title') or condition_id,
+            'event_slug': event_slug,
+            'date': trade.get('market_date'),
+            'info': None
+        }
+        event = self.events.get(event_slug)
+        if event is None:
+            event = self.events[event_slug] = {
+                'event_slug': event_slug,
+                'start_time': None,
+                'slug_date': parse_start_time(trade.get('market_date')),
+                'info_start': None,
+                'condition_ids': []
+            }
+            self._update_start(event)
+        event['condition_ids'].append(condition_id)
+
+    def set_market_info(self, condition_id, market_info):
+        """Attach fetched market info - its kick-off time is preferred over the bare slug date"""
+        market = self.markets.get(condition_id)
+        if market is None or not market_info:
+            return
+        market['info'] = market_info
+        info_start = parse_start_time(market_info.get('game_start_time'))
+        event = self.events[market['event_slug']]
+        if info_start and (event['info_start'] is None or info_start < event['info_start']):
+            event['info_start'] = info_start
+            self._update_start(event)
+
+    def _update_start(self, event):
+        """Keep the sorted start list in step with the event's best known start time"""
+        start_time = event['info_start'] or event['slug_date']
+        if start_time == event['start_time']:
+            return
+        if event['start_time'] is not None:
+            self._event_starts.remove((event['start_time'], event['event_slug']))
+        event['start_time'] = start_time
+        if start_time is not None:
+            insort(self._event_starts, (start_time, event['event_slug']))
+
+    def set_positions(self, condition_id, wallet_positions):
+        self.positions[condition_id] = wallet_positions
+
+    def markets_for_event(self, event_slug):
+        event = self.events.get(event_slug)
+        return [self.markets[cid] for cid in event['condition_ids']] if event else []
+
+    def event_exposure(self, event_slug):
+        """Per-wallet open cost and shares across every market of an event"""
+        exposure = {}
+        event = self.events.get(event_slug)
+        for condition_id in (event['condition_ids'] if event else []):
+            for wallet_label, position in self.positions.get(condition_id, {}).items():
+                wallet_exposure = exposure.setdefault(wallet_label, {'total_cost': 0.0, 'total_shares': 0.0, 'markets': 0})
+                wallet_exposure['total_cost'] += position['total_cost']
+                wallet_exposure['total_shares'] += position['total_shares']
+                wallet_exposure['markets'] += 1
+        return exposure
+
+    def events_starting_within(self, hours, now=None):
+        """Event slugs starting by now + hours, soonest first.
+
+        Events that have already started count as starting now - that includes games in
+        progress and game-day events known only by their slug date.
+        """
+        now = now or datetime.now(timezone.utc)
+        high = bisect_right(self._event_starts, now + timedelta(hours=hours), key=lambda item: item[0])
+        return [event_slug for _, event_slug in self._event_starts[:high]]
+
+def build_market_index(all_trades_by_wallet):
+    """Index every market traded by the tracked wallets"""
+    index = MarketIndex()
+    for wallet_data in all_trades_by_wallet.values():
+        for trade in wallet_data['trades']:
+            index.add_trade(trade)
+    return index
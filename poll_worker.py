@@ -0,0 +1,138 @@
+"""Polling worker - run several of these (on one or many hosts) to spread wallet polling.
+
+Wallets are split into shards; each worker claims a fair share of shards through
+leases in the shared store, polls the wallets in its shards and writes their trades
+back to the store. If a worker dies its leases expire and the others pick them up.
+The wallet list is the one the dashboard publishes to the store, so workers on
+other hosts see wallets added through the UI.
+
+    python poll_worker.py --store ~/.sharpscout/sharpscout.db
+    python poll_worker.py --store redis://localhost:6379/0
+"""
+import argparse
+import math
+import os
+import random
+import socket
+import time
+import uuid
+
+from config import STORE_URL, load_wallets
+from polymarket_api import fetch_trades
+from trade_store import open_store, shard_for_wallet
+
+DEFAULT_NUM_SHARDS = 16
+DEFAULT_LEASE_TTL = 30  # seconds
+DEFAULT_POLL_INTERVAL = 15  # seconds between passes over our wallets
+
+def load_published_wallets(store):
+    """Wallets the dashboard published to the store, or this host's wallet list until it has"""
+    return store.published_wallets() or load_wallets()
+
+class PollWorker:
+    def __init__(self, store, wallet_loader=None, num_shards=DEFAULT_NUM_SHARDS, lease_ttl=DEFAULT_LEASE_TTL,
+                 poll_interval=DEFAULT_POLL_INTERVAL, worker_id=None):
+        self.store = store
+        self.num_shards = num_shards
+        self.lease_ttl = lease_ttl
+        self.poll_interval = poll_interval
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.owned_shards = set()
+        self.wallet_loader = wallet_loader or (lambda: load_published_wallets(store))
+        self.last_renewed = 0
+
+    def wallets_by_shard(self):
+        """Group the current wallet list by shard (reloaded each pass to pick up new wallets)"""
+        by_shard = {}
+        for wallet_obj in self.wallet_loader():
+            wallet_address = wallet_obj['address'] if isinstance(wallet_obj, dict) else wallet_obj
+            by_shard.setdefault(shard_for_wallet(wallet_address, self.num_shards), []).append(wallet_address)
+        return by_shard
+
+    def log(self, message):
+        print(f"[{time.strftime('%H:%M:%S')}] {self.worker_id}: {message}", flush=True)
+
+    def renew_leases(self):
+        """Heartbeat and renew every lease we hold, dropping any we lost"""
+        self.store.heartbeat(self.worker_id, self.lease_ttl)
+        for shard in list(self.owned_shards):
+            if not self.store.acquire_lease(shard, self.worker_id, self.lease_ttl):
+                self.owned_shards.discard(shard)
+                self.log(f"lost lease on shard {shard}")
+        self.last_renewed = time.time()
+
+    def rebalance(self):
+        """Hold roughly num_shards / live_workers shards - release extras, claim free or expired ones"""
+        self.renew_leases()
+        live_workers = max(len(self.store.live_workers()), 1)
+        target = math.ceil(self.num_shards / live_workers)
+
+        while len(self.owned_shards) > target:
+            shard = self.owned_shards.pop()
+            self.store.release_lease(shard, self.worker_id)
+            self.log(f"released shard {shard}")
+
+        candidates = [s for s in range(self.num_shards) if s not in self.owned_shards]
+        random.shuffle(candidates)
+        for shard in candidates:
+            if len(self.owned_shards) >= target:
+                break
+            if self.store.acquire_lease(shard, self.worker_id, self.lease_ttl):
+                self.owned_shards.add(shard)
+                self.log(f"claimed shard {shard}")
+
+    def poll_once(self):
+        """One pass over the wallets in our shards"""
+        self.rebalance()
+        wallets_by_shard = self.wallets_by_shard()
+        polled = 0
+        for shard in sorted(self.owned_shards):
+            for wallet_address in wallets_by_shard.get(shard, []):
+                # Keep leases alive during long passes
+                if time.time() - self.last_renewed > self.lease_ttl / 3:
+                    self.renew_leases()
+                    if shard not in self.owned_shards:
+                        break
+                try:
+                    trades = fetch_trades(wallet_address)
+                except Exception as e:
+                    self.log(f"failed to fetch {wallet_address[:10]}: {e}")
+                    continue
+                self.store.save_trades(wallet_address, trades, self.worker_id)
+                polled += 1
+        return polled
+
+    def run(self):
+        self.log(f"starting with {self.num_shards} shards")
+        try:
+            while True:
+                started = time.time()
+                polled = self.poll_once()
+                self.log(f"polled {polled} wallets across shards {sorted(self.owned_shards)}")
+                time.sleep(max(self.poll_interval - (time.time() - started), 0))
+        finally:
+            for shard in self.owned_shards:
+                self.store.release_lease(shard, self.worker_id)
+            self.store.remove_worker(self.worker_id)
+
+def main():
+    parser = argparse.ArgumentParser(description="SharpScout polling worker")
+    parser.add_argument('--store', default=STORE_URL, help="sqlite path or redis:// URL shared by all workers")
+    parser.add_argument('--shards', type=int, default=DEFAULT_NUM_SHARDS, help="number of wallet shards (same on every worker)")
+    parser.add_argument('--lease-ttl', type=float, default=DEFAULT_LEASE_TTL, help="seconds before a dead worker's shards are reclaimed")
+    parser.add_argument('--interval', type=float, default=DEFAULT_POLL_INTERVAL, help="seconds between polling passes")
+    args = parser.parse_args()
+
+    worker = PollWorker(
+        open_store(args.store),
+        num_shards=args.shards,
+        lease_ttl=args.lease_ttl,
+        poll_interval=args.interval
+    )
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
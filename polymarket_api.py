@@ -0,0 +1,296 @@
+import json
+import os
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import requests
+from urllib3.util.request import ACCEPT_ENCODING
+
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library parser
+    orjson = None
+
+# Overridable so the dashboard can be pointed at a fake server (see loadtest.py)
+DATA_API_URL = os.environ.get('POLYMARKET_DATA_API_URL', "https://data-api.polymarket.com")
+CLOB_API_URL = os.environ.get('POLYMARKET_CLOB_API_URL', "https://clob.polymarket.com")
+
+JSON_BACKEND = 'orjson' if orjson is not None else 'json'
+
+# Only the trade fields aggregate_position, the exports and the UI read (including their fallbacks)
+TRADE_FIELDS = (
+    'conditionId', 'condition_id', 'market',
+    'title', 'marketName', 'market_name',
+    'eventSlug',
+    'outcome', 'outcomeName', 'outcomeTitle',
+    'side',
+    'size', 'amount', 'quantity',
+    'price', 'priceNum', 'fillPrice',
+    'timestamp', 'transactionHash', 'asset',
+)
+
+# One pooled session for keep-alive; advertise every encoding urllib3 can decode
+# (gzip/deflate always, br and zstd when brotli/zstandard are installed)
+session = requests.Session()
+session.headers['Accept-Encoding'] = ACCEPT_ENCODING
+
+# Transfer and parse counters of the current collect_http_stats() block, if any. Context-local,
+# so a session only counts its own calls - not other sessions' or the prefetch threads'
+_current_stats = ContextVar('http_stats', default=None)
+
+@contextmanager
+def collect_http_stats():
+    """Count the requests, bytes and JSON parse time of calls made inside the block"""
+    stats = {
+        'requests': 0,
+        'wire_bytes': 0,  # bytes received over the network (compressed)
+        'body_bytes': 0,  # bytes after decompression (what an uncompressed response would cost)
+        'parse_seconds': 0.0,
+    }
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+def http_get(url, params=None, timeout=8):
+    """GET through the shared session, counting compressed and decompressed bytes"""
+    response = session.get(url, params=params, timeout=timeout)
+    body_bytes = len(response.content)
+    try:
+        wire_bytes = response.raw.tell()
+    except Exception:
+        wire_bytes = 0
+    if not wire_bytes:
+        wire_bytes = int(response.headers.get('Content-Length') or body_bytes)
+
+    stats = _current_stats.get()
+    if stats is not None:
+        stats['requests'] += 1
+        stats['wire_bytes'] += wire_bytes
+        stats['body_bytes'] += body_bytes
+    return response
+
+def parse_json(response):
+    """Decode a response body with the fastest available JSON backend"""
+    started = time.perf_counter()
+    try:
+        if orjson is not None:
+            return orjson.loads(response.content)
+        return json.loads(response.content)
+    finally:
+        stats = _current_stats.get()
+        if stats is not None:
+            stats['parse_seconds'] += time.perf_counter() - started
+
+def project_trade(trade):
+    """Keep only the trade fields we use"""
+    return {field: trade[field] for field in TRADE_FIELDS if field in trade}
+
+def trades_from_payload(data):
+    """Pull the list of trades out of a /trades response body"""
+    if isinstance(data, list):
+        return data
+    elif isinstance(data, dict) and 'data' in data:
+        return data['data']
+    elif isinstance(data, dict) and 'trades' in data:
+        return data['trades']
+    return []
+
+def fetch_trades(wallet_address, limit=100, offset=0, timeout=8):
+    """Fetch one page of trades (newest first) for a wallet - raises on HTTP/network errors"""
+    url = f"{DATA_API_URL}/trades"
+    params = {
+        'user': wallet_address,
+        'limit': limit
+    }
+    if offset:
+        params['offset'] = offset
+    response = http_get(url, params=params, timeout=timeout)
+    response.raise_for_status()
+    return [project_trade(trade) for trade in trades_from_payload(parse_json(response))]
+
+def iter_trade_pages(wallet_address, page_size=500):
+    """Yield pages of trades (newest first) for a wallet, following offsets until the history ends.
+
+    HTTP/network errors are raised rather than ending the iteration, so a failed
+    page never passes for the end of the history.
+    """
+    offset = 0
+    while True:
+        page = fetch_trades(wallet_address, limit=page_size, offset=offset)
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        offset += page_size
+
+def extract_date_from_event_slug(event_slug):
+    """Extract date from eventSlug (e.g., 'nhl-nj-ott-2025-12-10' -> '2025-12-10')"""
+    if not event_slug:
+        return None
+    try:
+        # Event slug format: sport-team1-team2-YYYY-MM-DD or similar
+        # Look for YYYY-MM-DD pattern
+        date_match = re.search(r'(\d{4}-\d{2}-\d{2})', event_slug)
+        if date_match:
+            return date_match.group(1)
+    except Exception:
+        pass
+    return None
+
+def fetch_market_details(condition_id):
+    """Fetch market name, event date, current prices, and resolved status from Polymarket API.
+
+    'date' is the market's end date when known (falling back to its start). 'game_start_time' is
+    the kick-off time, or None - use it for anything that depends on when the event starts.
+    'resolved' also counts markets priced at <= 5c / >= 95c (used to hide rows), while 'closed'
+    is only set from the API's own closed/resolved status (used to settle markets).
+    """
+    if not condition_id:
+        return {
+            'name': 'Unknown Market', 'date': None, 'game_start_time': None, 'prices': {},
+            'resolved': False, 'closed': False
+        }
+    
+    market_name = None
+    event_date = None
+    game_start_time = None
+    outcome_prices = {}
+    is_resolved = False
+    is_closed = False
+    
+    # Try CLOB API first (most reliable for closed/resolved status)
+    try:
+        url = f"{CLOB_API_URL}/markets/{condition_id}"
+        response = http_get(url, timeout=3)
+        if response.status_code == 200:
+            market = parse_json(response)
+            market_name = market.get('question') or market.get('title')
+            event_date = market.get('end_date_iso') or market.get('game_start_time')
+            game_start_time = market.get('game_start_time')
+            
+            # Check closed status - this is the key field!
+            is_closed = market.get('closed', False) is True
+            if not is_closed:
+                is_closed = market.get('archived', False) is True
+            if not is_closed:
+                is_closed = market.get('accepting_orders', True) is False
+            is_resolved = is_closed
+            
+            # Get outcome prices from tokens
+            if 'tokens' in market:
+                for token in market['tokens']:
+                    outcome_name = token.get('outcome') or token.get('title')
+                    price = token.get('price')
+                    if outcome_name is not None and price is not None:
+                        try:
+                            outcome_prices[outcome_name] = float(price)
+                            # Also check if price indicates resolution
+                            if float(price) <= 0.05 or float(price) >= 0.95:
+                                is_resolved = True
+                        except (ValueError, TypeError):
+                            pass
+            
+            # Return if we got data
+            if market_name or outcome_prices:
+                return {
+                    'name': market_name, 'date': event_date, 'game_start_time': game_start_time,
+                    'prices': outcome_prices, 'resolved': is_resolved, 'closed': is_closed
+                }
+    except Exception:
+        pass
+    
+    # Try markets endpoint as fallback
+    try:
+        url = f"{DATA_API_URL}/markets"
+        params = {'conditionId': condition_id}
+        response = http_get(url, params=params, timeout=3)
+        if response.status_code == 200:
+            data = parse_json(response)
+            markets = data if isinstance(data, list) else (data.get('data', []) if isinstance(data, dict) else [])
+            if markets and len(markets) > 0:
+                market = markets[0]
+                if not market_name:
+                    market_name = market.get('question') or market.get('title') or market.get('slug')
+                if not event_date:
+                    event_date = market.get('endDate') or market.get('startDate') or market.get('date')
+                if not game_start_time:
+                    game_start_time = market.get('gameStartTime')
+                
+                # Check resolved status
+                if not is_closed:
+                    is_closed = market.get('resolved', False) is True
+                if not is_closed:
+                    is_closed = market.get('active', True) is False
+                is_resolved = is_resolved or is_closed
+                
+                # Get outcome prices from tokens
+                if 'tokens' in market and not outcome_prices:
+                    for token in market['tokens']:
+                        outcome_name = token.get('outcome') or token.get('title') or token.get('name')
+                        price = token.get('price') or token.get('lastPrice') or token.get('currentPrice') or token.get('lastPriceUsd')
+                        if outcome_name and price is not None:
+                            try:
+                                outcome_prices[outcome_name] = float(price)
+                                if float(price) <= 0.05 or float(price) >= 0.95:
+                                    is_resolved = True
+                            except (ValueError, TypeError):
+                                pass
+    except Exception:
+        pass
+    
+    # Fallback to events endpoint
+    try:
+        url = f"{DATA_API_URL}/events"
+        params = {'conditionId': condition_id}
+        response = http_get(url, params=params, timeout=3)
+        if response.status_code == 200:
+            data = parse_json(response)
+            event_data = None
+            if isinstance(data, list) and len(data) > 0:
+                event_data = data[0]
+            elif isinstance(data, dict):
+                if 'data' in data and isinstance(data['data'], list) and len(data['data']) > 0:
+                    event_data = data['data'][0]
+                else:
+                    event_data = data
+            
+            if event_data:
+                if not market_name:
+                    market_name = event_data.get('title') or event_data.get('question') or event_data.get('slug')
+                if not event_date:
+                    event_date = event_data.get('endDate') or event_data.get('startDate') or event_data.get('date') or event_data.get('eventDate')
+                if not game_start_time:
+                    game_start_time = event_data.get('startTime')
+                
+                # Check resolved status
+                if not is_closed:
+                    is_closed = event_data.get('resolved', False) is True
+                is_resolved = is_resolved or is_closed
+                
+                # Get outcome prices if available
+                if 'outcomes' in event_data:
+                    for outcome in event_data['outcomes']:
+                        outcome_name = outcome.get('title') or outcome.get('name')
+                        price = outcome.get('price') or outcome.get('lastPrice') or outcome.get('currentPrice')
+                        if outcome_name and price is not None:
+                            try:
+                                outcome_prices[outcome_name] = float(price)
+                            except (ValueError, TypeError):
+                                pass
+    except Exception:
+        pass
+    
+    # Fallback to shortened condition_id
+    if not market_name:
+        short_id = condition_id[:16] + '...' if len(condition_id) > 16 else condition_id
+        market_name = short_id
+    
+    return {
+        'name': market_name, 'date': event_date, 'game_start_time': game_start_time,
+        'prices': outcome_prices, 'resolved': is_resolved, 'closed': is_closed
+    }
@@ -0,0 +1,113 @@
+from collections import deque
+
+# Cost basis methods for PositionBook
+COST_BASIS_METHODS = {
+    'fifo': 'FIFO',
+    'average': 'Average cost',
+}
+DEFAULT_COST_BASIS_METHOD = 'fifo'
+
+# Share amounts below this are treated as zero (float dust from partial fills)
+SHARE_EPSILON = 0.0001
+
+def parse_trade(trade):
+    """(is_buy, amount, price) from an API trade, or None if it has no size or price"""
+    # Use 'size' field directly from API (more reliable)
+    amount = float(trade.get('size', 0) or trade.get('amount', 0) or trade.get('quantity', 0) or 0)
+    if amount == 0:
+        return None
+
+    # Use 'price' field directly from API
+    price = float(trade.get('price', 0) or trade.get('priceNum', 0) or trade.get('fillPrice', 0) or 0)
+    if price == 0:
+        return None
+
+    # Use 'side' field directly from API - it's explicitly "BUY" or "SELL"
+    side = (trade.get('side', '') or '').upper()
+    return side == 'BUY', amount, price
+
+class PositionBook:
+    """Open lots and realized PnL for one wallet/market/outcome, updated one trade at a time.
+
+    Lots live in a deque, oldest first. Buys append a lot (or merge into the single
+    lot under average cost) and sells consume lots from the left, so each lot is
+    pushed and popped once and every trade costs amortized O(1). Polymarket shares
+    can't be shorted: sells beyond the shares we've seen bought (fills older than
+    the fetched history) have no known basis and are counted in unmatched_shares
+    instead of going negative.
+    """
+
+    def __init__(self, method=DEFAULT_COST_BASIS_METHOD):
+        if method not in COST_BASIS_METHODS:
+            raise ValueError(f"Unknown cost basis method: {method}")
+        self.method = method
+        self.lots = deque()  # [shares, price per share]
+        self.shares = 0.0
+        self.open_cost = 0.0
+        self.realized_pnl = 0.0
+        self.bought_shares = 0.0
+        self.bought_cost = 0.0
+        self.unmatched_shares = 0.0
+        self.buy_count = 0
+        self.sell_count = 0
+
+    @property
+    def avg_cost_per_share(self):
+        return self.open_cost / self.shares if self.shares > SHARE_EPSILON else 0
+
+    def buy(self, amount, price):
+        self.buy_count += 1
+        self.bought_shares += amount
+        self.bought_cost += amount * price
+
+        if self.method == 'average' and self.lots:
+            lot = self.lots[0]
+            lot[1] = (lot[0] * lot[1] + amount * price) / (lot[0] + amount)
+            lot[0] += amount
+        else:
+            self.lots.append([amount, price])
+        self.shares += amount
+        self.open_cost += amount * price
+
+    def sell(self, amount, price):
+        self.sell_count += 1
+        remaining = amount
+        while remaining > SHARE_EPSILON and self.lots:
+            lot = self.lots[0]
+            matched = min(lot[0], remaining)
+            self.realized_pnl += matched * (price - lot[1])
+            self.open_cost -= matched * lot[1]
+            self.shares -= matched
+            lot[0] -= matched
+            remaining -= matched
+            if lot[0] <= SHARE_EPSILON:
+                self.lots.popleft()
+
+        if remaining > SHARE_EPSILON:
+            self.unmatched_shares += remaining
+        if not self.lots:
+            # Clear float drift once everything is sold
+            self.shares = 0.0
+            self.open_cost = 0.0
+
+    def apply(self, trade):
+        """Apply one API trade (trades must arrive oldest first)"""
+        parsed = parse_trade(trade)
+        if parsed is None:
+            return
+        is_buy, amount, price = parsed
+        if is_buy:
+            self.buy(amount, price)
+        else:
+            self.sell(amount, price)
+
+def chronological(trades):
+    """Trades oldest first - the API returns newest first, ties keep that order reversed"""
+    return sorted(reversed(trades), key=lambda trade: int(trade.get('timestamp') or 0))
+
+def build_position_book(trades, method=DEFAULT_COST_BASIS_METHOD):
+    """PositionBook with every trade applied in time order"""
+    book = PositionBook(method)
+    for trade in chronological(trades):
+        book.apply(trade)
+    return book
@@ -0,0 +1,165 @@
+"""Background warm-up and prefetch of trades and market info.
+
+On start every configured wallet's trades and the info of every market they
+hold are fetched in parallel, so the first page load is served warm. After
+that a scheduler keeps refreshing: wallets on a fixed interval, markets more
+often the closer their event is to starting.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from market_index import parse_start_time
+from polymarket_api import extract_date_from_event_slug, fetch_market_details, fetch_trades
+
+TRADES_REFRESH_INTERVAL = 120  # seconds
+
+# (event starts within this many hours, refresh market every N seconds) - first match wins
+# Started events count as starting now, which includes game-day slugs without a time
+PREFETCH_SCHEDULE = [
+    (3, 30),
+    (24, 120),
+    (72, 600),
+]
+PREFETCH_DEFAULT_INTERVAL = 1800
+
+# Prefetched data is served while younger than this many refresh intervals
+FRESHNESS_FACTOR = 2
+
+def refresh_interval(start_time, now=None):
+    """Seconds between refreshes for a market whose event starts at start_time"""
+    if start_time is None:
+        return PREFETCH_DEFAULT_INTERVAL
+    now = now or datetime.now(timezone.utc)
+    hours_until_start = (start_time - now).total_seconds() / 3600
+    for within_hours, interval in PREFETCH_SCHEDULE:
+        if hours_until_start <= within_hours:
+            return interval
+    return PREFETCH_DEFAULT_INTERVAL
+
+class Prefetcher:
+    def __init__(self, wallet_loader, max_workers=8, tick=5):
+        self.wallet_loader = wallet_loader
+        self.tick = tick
+        self.warmed = threading.Event()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='prefetch')
+        self._lock = threading.Lock()
+        self._trades = {}  # wallet_address -> {'data', 'fetched_at', 'attempted_at'}
+        self._markets = {}  # condition_id -> {'data', 'fetched_at', 'attempted_at', 'slug_date'}
+
+    def start(self):
+        threading.Thread(target=self._run, name='prefetch-scheduler', daemon=True).start()
+        return self
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh_due()
+            except Exception:
+                pass
+            # The first pass is the warm-up
+            self.warmed.set()
+            time.sleep(self.tick)
+
+    def refresh_due(self):
+        """Refresh every wallet and market whose interval has elapsed (everything, on the first pass)"""
+        now = time.time()
+        wallet_addresses = [
+            (wallet_obj['address'] if isinstance(wallet_obj, dict) else wallet_obj).lower()
+            for wallet_obj in self.wallet_loader()
+        ]
+        due_wallets = [
+            wallet_address for wallet_address in wallet_addresses
+            if now - self._trades.get(wallet_address, {}).get('attempted_at', 0) >= TRADES_REFRESH_INTERVAL
+        ]
+        list(self._pool.map(self._refresh_wallet, due_wallets))
+
+        today = datetime.now().date()
+        utc_now = datetime.now(timezone.utc)
+        with self._lock:
+            # Stop tracking markets whose event day has passed
+            for condition_id in [cid for cid, entry in self._markets.items() if entry['slug_date'] and entry['slug_date'] < today]:
+                del self._markets[condition_id]
+            due_markets = [
+                condition_id for condition_id, entry in self._markets.items()
+                if now - entry['attempted_at'] >= refresh_interval(self._start_time(entry), utc_now)
+            ]
+        list(self._pool.map(self._refresh_market, due_markets))
+
+    def _refresh_wallet(self, wallet_address):
+        attempted_at = time.time()
+        try:
+            trades = fetch_trades(wallet_address, limit=100)
+        except Exception:
+            trades = None
+
+        today = datetime.now().date()
+        with self._lock:
+            entry = self._trades.setdefault(wallet_address, {'data': None, 'fetched_at': 0})
+            entry['attempted_at'] = attempted_at
+            if trades is None:
+                return
+            entry['data'] = trades
+            entry['fetched_at'] = attempted_at
+
+            # Track the markets of today's and upcoming events
+            for trade in trades:
+                condition_id = trade.get('conditionId') or trade.get('condition_id') or trade.get('market')
+                event_date_str = extract_date_from_event_slug(trade.get('eventSlug'))
+                if not condition_id or not event_date_str or condition_id in self._markets:
+                    continue
+                slug_date = datetime.strptime(event_date_str, '%Y-%m-%d').date()
+                if slug_date >= today:
+                    self._markets[condition_id] = {'data': None, 'fetched_at': 0, 'attempted_at': 0, 'slug_date': slug_date}
+
+    def _refresh_market(self, condition_id):
+        attempted_at = time.time()
+        info = fetch_market_details(condition_id)
+        with self._lock:
+            entry = self._markets.get(condition_id)
+            if entry is None:
+                return
+            entry['attempted_at'] = attempted_at
+            # fetch_market_details returns a placeholder without prices when every endpoint failed -
+            # keep the previous data (and its age) rather than serving the placeholder as fresh
+            if not info.get('prices'):
+                return
+            entry.update({'data': info, 'fetched_at': attempted_at})
+
+    @staticmethod
+    def _start_time(entry):
+        """Kick-off time of a tracked market's event, falling back to midnight UTC of its slug date"""
+        info = entry['data'] or {}
+        start_time = parse_start_time(info.get('game_start_time'))
+        if start_time is None and entry['slug_date']:
+            start_time = parse_start_time(entry['slug_date'].isoformat())
+        return start_time
+
+    def invalidate(self):
+        """Mark everything stale - nothing is served until it's refetched, which the next tick does"""
+        with self._lock:
+            for entry in list(self._trades.values()) + list(self._markets.values()):
+                entry['fetched_at'] = 0
+                entry['attempted_at'] = 0
+
+    def get_trades(self, wallet_address):
+        """Copy of a wallet's prefetched trades, or None if missing or stale"""
+        with self._lock:
+            entry = self._trades.get(wallet_address.lower())
+            if not entry or entry['data'] is None:
+                return None
+            if time.time() - entry['fetched_at'] > TRADES_REFRESH_INTERVAL * FRESHNESS_FACTOR:
+                return None
+            return [dict(trade) for trade in entry['data']]
+
+    def get_market_info(self, condition_id):
+        """Prefetched market info, or None if the market isn't tracked or is stale"""
+        with self._lock:
+            entry = self._markets.get(condition_id)
+            if not entry or entry['data'] is None:
+                return None
+            max_age = refresh_interval(self._start_time(entry)) * FRESHNESS_FACTOR
+            if time.time() - entry['fetched_at'] > max_age:
+                return None
+            return entry['data']
@@ -0,0 +1,119 @@
+"""Settle closed markets into per-wallet performance stats.
+
+Settlement reads its own window of each wallet's trades rather than the
+dashboard's (which only holds today's and later games, and on the API path the
+latest 100 trades), so markets that close days after kick-off still settle
+with every buy of the position in view. Positions are skipped per wallet and
+market once recorded, so a wallet that was missing from one pass - a failed
+fetch, or added later - is settled on a later one.
+"""
+from datetime import datetime, timedelta
+
+from polymarket_api import extract_date_from_event_slug, iter_trade_pages
+from positions import SHARE_EPSILON, build_position_book
+
+# A closed market is settled on the outcome priced at least this close to $1
+SETTLEMENT_PRICE = 0.99
+
+# Trades this many days back are read for settlement
+SETTLEMENT_LOOKBACK_DAYS = 30
+
+# Game markets open at most this many days before their slug date, so a market whose slug date
+# is this far inside the window has all its trades in the window - older markets are not settled
+MARKET_OPEN_DAYS = 7
+
+SETTLEMENT_PAGE_SIZE = 500
+
+def winning_outcome(market_info):
+    """Outcome a closed market pays out on, or None if it can't be told yet.
+
+    Unlike the 5c/95c check that hides rows, this needs the API to report the market closed and
+    one outcome priced at SETTLEMENT_PRICE or more - an in-play 96c favourite isn't settled.
+    """
+    if not market_info or not market_info.get('closed'):
+        return None
+    best_outcome = None
+    best_price = 0.0
+    for outcome_name, price in market_info.get('prices', {}).items():
+        try:
+            price_float = float(price)
+        except (ValueError, TypeError):
+            continue
+        if price_float > best_price:
+            best_outcome = outcome_name
+            best_price = price_float
+    return best_outcome if best_price >= SETTLEMENT_PRICE else None
+
+def settlement_window(now=None):
+    """(unix time the trade window starts at, earliest slug date that can be settled)"""
+    since_date = (now or datetime.now()).date() - timedelta(days=SETTLEMENT_LOOKBACK_DAYS)
+    since = int(datetime.combine(since_date, datetime.min.time()).timestamp())
+    return since, since_date + timedelta(days=MARKET_OPEN_DAYS)
+
+def load_settlement_trades(store, wallet_address, since, max_store_age):
+    """A wallet's trades since `since`, newest first - from the store if a worker polled it
+    within max_store_age seconds, otherwise paged from the API until the window is covered.
+    API errors are raised so a partial history is never settled."""
+    polled_at = store.last_polled(wallet_address)
+    if polled_at is not None and datetime.now().timestamp() - polled_at <= max_store_age:
+        return store.load_trades(wallet_address, since=since)
+
+    trades = []
+    for page in iter_trade_pages(wallet_address, page_size=SETTLEMENT_PAGE_SIZE):
+        for trade in page:
+            if int(trade.get('timestamp') or 0) < since:
+                return trades
+            trades.append(trade)
+    return trades
+
+def settled_positions(wallet_address, wallet_label, outcome_trades, winner):
+    """Position records for one wallet in one closed market (outcome_trades: outcome -> trades)"""
+    positions = []
+    for outcome, trades_list in outcome_trades.items():
+        book = build_position_book(trades_list)
+        if book.bought_shares < SHARE_EPSILON:
+            continue
+        # Realized PnL from sells plus open shares paid out at $1 (winner) or $0
+        settlement_value = book.shares if outcome == winner else 0.0
+        pnl = book.realized_pnl + settlement_value - book.open_cost
+        positions.append({
+            'wallet_address': wallet_address,
+            'wallet_label': wallet_label,
+            'outcome': outcome,
+            'shares': book.bought_shares,
+            'cost': book.bought_cost,
+            'payout': book.bought_cost + pnl,
+            'pnl': pnl
+        })
+    return positions
+
+def settle_wallet(store, wallet_address, wallet_label, trades, market_info_loader, min_slug_date, today=None):
+    """Settle every closed market in a wallet's trades that isn't settled for it yet.
+
+    market_info_loader(condition_id) returns market info as from fetch_market_details.
+    Returns the number of markets settled.
+    """
+    today = today or datetime.now().date()
+    market_trades = {}  # condition_id -> outcome -> trades
+    for trade in trades:
+        condition_id = trade.get('conditionId') or trade.get('condition_id') or trade.get('market')
+        slug_date_str = extract_date_from_event_slug(trade.get('eventSlug'))
+        if not condition_id or not slug_date_str:
+            continue
+        # Only games that have been played, and whose whole history is in the window
+        slug_date = datetime.strptime(slug_date_str, '%Y-%m-%d').date()
+        if slug_date < min_slug_date or slug_date > today:
+            continue
+        outcome = trade.get('outcome') or trade.get('outcomeName', 'Unknown')
+        market_trades.setdefault(condition_id, {}).setdefault(outcome, []).append(trade)
+
+    pending = set(market_trades) - store.settled_condition_ids(wallet_address, market_trades)
+    settled = 0
+    for condition_id in pending:
+        winner = winning_outcome(market_info_loader(condition_id))
+        if winner is None:
+            continue
+        positions = settled_positions(wallet_address, wallet_label, market_trades[condition_id], winner)
+        store.record_settlement(condition_id, winner, positions)
+        settled += 1
+    return settled
@@ -1,10 +1,33 @@
 import streamlit as st
-import requests
 import json
 import os
-import pandas as pd
-import re
-from datetime import datetime
+import io
+import csv
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import partial
+
+from config import PREFETCH_ENABLED, WALLETS_FILE, STORE_URL, load_wallets
+from polymarket_api import (
+    CLOB_API_URL, JSON_BACKEND, collect_http_stats, extract_date_from_event_slug, fetch_market_details,
+    fetch_trades, http_get, iter_trade_pages, parse_json
+)
+from trade_store import open_store
+from market_index import build_market_index
+from prefetch import Prefetcher
+from settlement import load_settlement_trades, settle_wallet, settlement_window
+from positions import (
+    COST_BASIS_METHODS, DEFAULT_COST_BASIS_METHOD, SHARE_EPSILON, build_position_book, parse_trade
+)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional
+    pa = None
+    pq = None
 
 # Page config
 st.set_page_config(
@@ -59,209 +82,104 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Hardcoded wallet addresses to track
-HARDCODED_WALLETS = [
-    {'address': '0x16b29c50f2439faf627209b2ac0c7bbddaa8a881', 'label': 'Freedom'},
-    #{'address': '0xee613b3fc183ee44f9da9c05f53e2da107e3debf', 'label': 'Quantbet'},#
-    {'address': '0x91654fd592ea5339fc0b1b2f2b30bfffa5e75b98', 'label': 'ST'},
-    {'address': '0x6a72f61820b26b1fe4d956e17b6dc2a1ea3033ee', 'label': 'Kyle/Ray'},
-    {'address': '0x14964aefa2cd7caff7878b3820a690a03c5aa429', 'label': 'GMPM'},
-    {'address': '0x2c57db9e442ef5ffb2651f03afd551171738c94d', 'label': 'ZeroOptimist'},
-    {'address': '0x9f138019d5481fdc5c59b93b0ae4b9b817cce0fd', 'label': 'Bienville'},
-    # Add more wallets here as needed
-    # {'address': '0x...', 'label': 'WalletName'},
+# Export settings - rows are generated and written to a temp file in chunks, so building an
+# export never holds every row at once (Streamlit still reads the finished file to serve it)
+EXPORT_CHUNK_SIZE = 5000
+EXPORT_TRADES_PAGE_SIZE = 500
+
+# Trades written by poll_worker.py are used instead of hitting the API while they're this fresh
+STORE_MAX_AGE = 120  # seconds
+
+# Only trades from this many days back are read from the store - the page shows today's and
+# later games, and game markets only open a few days before kick-off
+STORE_TRADES_LOOKBACK_DAYS = 7
+
+# Seconds between settlement passes (each reads every wallet's recent trade history)
+SETTLEMENT_INTERVAL = 600
+
+# How long the first page load waits for the server's warm-up pass instead of fetching itself
+PREFETCH_WARMUP_WAIT = 20  # seconds
+EXPORT_FORMATS = {
+    'CSV': {'extension': 'csv', 'mime': 'text/csv'},
+    'JSONL': {'extension': 'jsonl', 'mime': 'application/x-ndjson'},
+}
+if pa is not None:
+    EXPORT_FORMATS['Parquet'] = {'extension': 'parquet', 'mime': 'application/vnd.apache.parquet'}
+
+# Column name -> type for each export kind (types are used for the Parquet schema)
+POSITION_EXPORT_FIELDS = [
+    ('Market Name', 'str'),
+    ('Market Date', 'str'),
+    ('Wallet Label', 'str'),
+    ('Outcome', 'str'),
+    ('Total Shares', 'float'),
+    ('Avg Cost Per Share', 'float'),
+    ('Total Cost', 'float'),
+    ('Realized PnL', 'float'),
+    ('Trade Count', 'int'),
+]
+TRADE_EXPORT_FIELDS = [
+    ('Timestamp', 'str'),
+    ('Wallet Label', 'str'),
+    ('Wallet Address', 'str'),
+    ('Market Name', 'str'),
+    ('Condition ID', 'str'),
+    ('Event Slug', 'str'),
+    ('Outcome', 'str'),
+    ('Side', 'str'),
+    ('Size', 'float'),
+    ('Price', 'float'),
+    ('Transaction Hash', 'str'),
 ]
 
-# File to store wallet addresses (for additional wallets added via UI)
-DATA_DIR = os.path.expanduser('~/.sharpscout')
-WALLETS_FILE = os.path.join(DATA_DIR, 'wallets.json')
+@st.cache_resource
+def get_trade_store():
+    """Shared store that polling workers write trades into"""
+    return open_store(STORE_URL)
 
-# Create data directory if it doesn't exist
-os.makedirs(DATA_DIR, exist_ok=True)
+def publish_wallets(wallets):
+    """Share the wallet list with polling workers, which may run on other hosts"""
+    try:
+        get_trade_store().publish_wallets(
+            [w if isinstance(w, dict) else {'address': w, 'label': ''} for w in wallets]
+        )
+    except Exception:
+        pass
 
-# Initialize session state with hardcoded wallets
+# Initialize session state with hardcoded wallets plus any added via the UI
 if 'wallets' not in st.session_state:
-    # Start with hardcoded wallets
-    st.session_state.wallets = HARDCODED_WALLETS.copy()
-    
-    # Also load any additional wallets from file
-    if os.path.exists(WALLETS_FILE):
-        with open(WALLETS_FILE, 'r') as f:
-            wallets_data = json.load(f)
-            # Convert old format (list of strings) to new format (list of dicts)
-            if wallets_data and isinstance(wallets_data[0], str):
-                file_wallets = [{'address': addr, 'label': ''} for addr in wallets_data]
-            else:
-                file_wallets = wallets_data
-            
-            # Add file wallets that aren't already in hardcoded list
-            hardcoded_addresses = {w['address'].lower() for w in HARDCODED_WALLETS}
-            for wallet in file_wallets:
-                if wallet.get('address', '').lower() not in hardcoded_addresses:
-                    st.session_state.wallets.append(wallet)
+    st.session_state.wallets = load_wallets()
+    publish_wallets(st.session_state.wallets)
 
 if 'market_cache' not in st.session_state:
     st.session_state.market_cache = {}
 
-def load_wallets():
-    """Load wallet addresses - combines hardcoded and file wallets"""
-    wallets = HARDCODED_WALLETS.copy()
-    
-    # Add wallets from file that aren't already in hardcoded list
-    if os.path.exists(WALLETS_FILE):
-        with open(WALLETS_FILE, 'r') as f:
-            file_wallets_data = json.load(f)
-            # Convert old format (list of strings) to new format (list of dicts)
-            if file_wallets_data and isinstance(file_wallets_data[0], str):
-                file_wallets = [{'address': addr, 'label': ''} for addr in file_wallets_data]
-            else:
-                file_wallets = file_wallets_data
-            
-            # Add file wallets that aren't already in hardcoded list
-            hardcoded_addresses = {w['address'].lower() for w in HARDCODED_WALLETS}
-            for wallet in file_wallets:
-                if wallet.get('address', '').lower() not in hardcoded_addresses:
-                    wallets.append(wallet)
-    
-    return wallets
+@st.cache_resource
+def get_prefetcher():
+    """One background prefetcher per server process, started by the first script run"""
+    return Prefetcher(load_wallets).start()
+
+prefetcher = get_prefetcher() if PREFETCH_ENABLED else None
 
 def save_wallets(wallets):
     """Save wallet addresses to file"""
     with open(WALLETS_FILE, 'w') as f:
         json.dump(wallets, f, indent=2)
     st.session_state.wallets = wallets
+    publish_wallets(wallets)
 
 @st.cache_data(ttl=60)  # Cache for 1 minute (short to catch resolved markets quickly)
 def fetch_market_info_cached(condition_id):
     """Fetch market name, event date, current prices, and resolved status from Polymarket API (cached)"""
-    if not condition_id:
-        return {'name': 'Unknown Market', 'date': None, 'prices': {}, 'resolved': False}
-    
-    market_name = None
-    event_date = None
-    outcome_prices = {}
-    is_resolved = False
-    
-    # Try CLOB API first (most reliable for closed/resolved status)
-    try:
-        url = f"https://clob.polymarket.com/markets/{condition_id}"
-        response = requests.get(url, params={}, timeout=3)
-        if response.status_code == 200:
-            market = response.json()
-            market_name = market.get('question') or market.get('title')
-            event_date = market.get('end_date_iso') or market.get('game_start_time')
-            
-            # Check closed status - this is the key field!
-            is_resolved = market.get('closed', False) is True
-            if not is_resolved:
-                is_resolved = market.get('archived', False) is True
-            if not is_resolved:
-                is_resolved = market.get('accepting_orders', True) is False
-            
-            # Get outcome prices from tokens
-            if 'tokens' in market:
-                for token in market['tokens']:
-                    outcome_name = token.get('outcome') or token.get('title')
-                    price = token.get('price')
-                    if outcome_name is not None and price is not None:
-                        try:
-                            outcome_prices[outcome_name] = float(price)
-                            # Also check if price indicates resolution
-                            if float(price) <= 0.05 or float(price) >= 0.95:
-                                is_resolved = True
-                        except (ValueError, TypeError):
-                            pass
-            
-            # Return if we got data
-            if market_name or outcome_prices:
-                return {'name': market_name, 'date': event_date, 'prices': outcome_prices, 'resolved': is_resolved}
-    except Exception:
-        pass
-    
-    # Try markets endpoint as fallback
-    try:
-        url = "https://data-api.polymarket.com/markets"
-        params = {'conditionId': condition_id}
-        response = requests.get(url, params=params, timeout=3)
-        if response.status_code == 200:
-            data = response.json()
-            markets = data if isinstance(data, list) else (data.get('data', []) if isinstance(data, dict) else [])
-            if markets and len(markets) > 0:
-                market = markets[0]
-                if not market_name:
-                    market_name = market.get('question') or market.get('title') or market.get('slug')
-                if not event_date:
-                    event_date = market.get('endDate') or market.get('startDate') or market.get('date')
-                
-                # Check resolved status
-                if not is_resolved:
-                    is_resolved = market.get('resolved', False) is True
-                if not is_resolved:
-                    is_resolved = market.get('active', True) is False
-                
-                # Get outcome prices from tokens
-                if 'tokens' in market and not outcome_prices:
-                    for token in market['tokens']:
-                        outcome_name = token.get('outcome') or token.get('title') or token.get('name')
-                        price = token.get('price') or token.get('lastPrice') or token.get('currentPrice') or token.get('lastPriceUsd')
-                        if outcome_name and price is not None:
-                            try:
-                                outcome_prices[outcome_name] = float(price)
-                                if float(price) <= 0.05 or float(price) >= 0.95:
-                                    is_resolved = True
-                            except (ValueError, TypeError):
-                                pass
-    except Exception:
-        pass
-    
-    # Fallback to events endpoint
-    try:
-        url = "https://data-api.polymarket.com/events"
-        params = {'conditionId': condition_id}
-        response = requests.get(url, params=params, timeout=3)
-        if response.status_code == 200:
-            data = response.json()
-            event_data = None
-            if isinstance(data, list) and len(data) > 0:
-                event_data = data[0]
-            elif isinstance(data, dict):
-                if 'data' in data and isinstance(data['data'], list) and len(data['data']) > 0:
-                    event_data = data['data'][0]
-                else:
-                    event_data = data
-            
-            if event_data:
-                if not market_name:
-                    market_name = event_data.get('title') or event_data.get('question') or event_data.get('slug')
-                if not event_date:
-                    event_date = event_data.get('endDate') or event_data.get('startDate') or event_data.get('date') or event_data.get('eventDate')
-                
-                # Check resolved status
-                if not is_resolved:
-                    is_resolved = event_data.get('resolved', False) is True
-                
-                # Get outcome prices if available
-                if 'outcomes' in event_data:
-                    for outcome in event_data['outcomes']:
-                        outcome_name = outcome.get('title') or outcome.get('name')
-                        price = outcome.get('price') or outcome.get('lastPrice') or outcome.get('currentPrice')
-                        if outcome_name and price is not None:
-                            try:
-                                outcome_prices[outcome_name] = float(price)
-                            except (ValueError, TypeError):
-                                pass
-    except Exception:
-        pass
-    
-    # Fallback to shortened condition_id
-    if not market_name:
-        short_id = condition_id[:16] + '...' if len(condition_id) > 16 else condition_id
-        market_name = short_id
-    
-    return {'name': market_name, 'date': event_date, 'prices': outcome_prices, 'resolved': is_resolved}
+    return fetch_market_details(condition_id)
 
-def fetch_market_info(condition_id):
-    """Fetch market info with session cache layer"""
+def fetch_market_info(condition_id, fresh=False):
+    """Fetch market info - prefetched if fresh, then session cache, then API (fresh skips the prefetcher)"""
+    if prefetcher is not None and not fresh:
+        prefetched = prefetcher.get_market_info(condition_id)
+        if prefetched is not None:
+            return prefetched
+    
     cache_key = f"{condition_id}_info"
     if cache_key in st.session_state.market_cache:
         return st.session_state.market_cache[cache_key]
@@ -293,49 +211,41 @@ def fetch_market_name(condition_id):
     info = fetch_market_info(condition_id)
     return info['name']
 
+@st.cache_data(ttl=STORE_MAX_AGE)
+def load_stored_trades_cached(wallet_address, polled_at, since):
+    """Recent stored trades - cached per poll, so reruns between polls don't hit the store"""
+    return get_trade_store().load_trades(wallet_address, since=since)
+
+def fetch_stored_trades(wallet_address):
+    """Trades collected by polling workers, or None if no worker has polled this wallet recently"""
+    try:
+        store = get_trade_store()
+        polled_at = store.last_polled(wallet_address)
+        if polled_at is None or datetime.now().timestamp() - polled_at > STORE_MAX_AGE:
+            return None
+        # Day-aligned so the cache key only changes when a worker polls again
+        since_date = datetime.now().date() - timedelta(days=STORE_TRADES_LOOKBACK_DAYS)
+        since = int(datetime.combine(since_date, datetime.min.time()).timestamp())
+        return load_stored_trades_cached(wallet_address, polled_at, since)
+    except Exception:
+        return None
+
 @st.cache_data(ttl=300)  # Cache trades for 5 minutes
 def fetch_polymarket_trades_cached(wallet_address):
     """Fetch trades from Polymarket API (cached)"""
     try:
-        url = "https://data-api.polymarket.com/trades"
-        params = {
-            'user': wallet_address,
-            'limit': 100
-        }
-        response = requests.get(url, params=params, timeout=8)  # Reduced timeout
-        response.raise_for_status()
-        data = response.json()
-        
-        trades = []
-        if isinstance(data, list):
-            trades = data
-        elif isinstance(data, dict) and 'data' in data:
-            trades = data['data']
-        elif isinstance(data, dict) and 'trades' in data:
-            trades = data['trades']
-        
-        return trades
+        return fetch_trades(wallet_address, limit=100)
     except Exception as e:
         return []
 
-def extract_date_from_event_slug(event_slug):
-    """Extract date from eventSlug (e.g., 'nhl-nj-ott-2025-12-10' -> '2025-12-10')"""
-    if not event_slug:
-        return None
-    try:
-        # Event slug format: sport-team1-team2-YYYY-MM-DD or similar
-        # Look for YYYY-MM-DD pattern
-        import re
-        date_match = re.search(r'(\d{4}-\d{2}-\d{2})', event_slug)
-        if date_match:
-            return date_match.group(1)
-    except Exception:
-        pass
-    return None
-
-def fetch_polymarket_trades(wallet_address):
-    """Fetch trades and filter by today or future dates from eventSlug"""
-    trades = fetch_polymarket_trades_cached(wallet_address)
+def fetch_polymarket_trades(wallet_address, fresh=False):
+    """Fetch trades and filter by today or future dates from eventSlug (fresh goes straight to the API)"""
+    # Prefer trades kept fresh by poll_worker.py, fall back to polling the API ourselves
+    trades = None if fresh else fetch_stored_trades(wallet_address)
+    if trades is None and prefetcher is not None and not fresh:
+        trades = prefetcher.get_trades(wallet_address)
+    if trades is None:
+        trades = fetch_polymarket_trades_cached(wallet_address)
     
     if not trades:
         return []
@@ -375,52 +285,22 @@ def fetch_polymarket_trades(wallet_address):
     
     return active_trades
 
-def aggregate_position(trades):
-    """Aggregate trades into a single position with improved position recognition"""
+def aggregate_position(trades, method=DEFAULT_COST_BASIS_METHOD):
+    """Aggregate trades into a single open position using lot-based cost basis (FIFO or average cost)"""
     if not trades:
         return None
     
-    total_shares = 0
-    total_cost = 0
-    outcomes = set()
-    buy_trades = []
-    sell_trades = []
-    
-    for trade in trades:
-        # Use 'size' field directly from API (more reliable)
-        amount = float(trade.get('size', 0) or trade.get('amount', 0) or trade.get('quantity', 0) or 0)
-        if amount == 0:
-            continue
-            
-        # Use 'price' field directly from API
-        price = float(trade.get('price', 0) or trade.get('priceNum', 0) or trade.get('fillPrice', 0) or 0)
-        if price == 0:
-            continue
-        
-        # Use 'side' field directly from API - it's explicitly "BUY" or "SELL"
-        side = (trade.get('side', '') or '').upper()
-        outcome = trade.get('outcome') or trade.get('outcomeName') or trade.get('outcomeTitle') or 'Unknown'
-        outcomes.add(outcome)
-        
-        # Determine buy/sell from explicit side field
-        is_buy = side == 'BUY'
-        
-        # Track trades separately for better analysis
-        if is_buy:
-            buy_trades.append({'amount': amount, 'price': price})
-            total_shares += amount
-            total_cost += amount * price
-        else:
-            sell_trades.append({'amount': amount, 'price': price})
-            total_shares -= amount
-            total_cost -= amount * price  # Selling reduces cost basis
+    book = build_position_book(trades, method)
     
-    # Only return position if there are net shares
-    if abs(total_shares) < 0.0001:
+    # Only return position if there are open shares
+    if book.shares < SHARE_EPSILON:
         return None
     
-    # Calculate weighted average cost
-    avg_cost = total_cost / total_shares if total_shares != 0 else 0
+    outcomes = {
+        trade.get('outcome') or trade.get('outcomeName') or trade.get('outcomeTitle') or 'Unknown'
+        for trade in trades
+        if parse_trade(trade) is not None
+    }
     
     # Get most common outcome or combine if multiple
     if len(outcomes) == 1:
@@ -432,17 +312,64 @@ def aggregate_position(trades):
     
     return {
         'outcome': outcome_str,
-        'total_shares': abs(total_shares),
-        'avg_cost_per_share': avg_cost,
-        'total_cost': abs(total_cost),
-        'position_type': 'Long' if total_shares > 0 else 'Short',
+        'total_shares': book.shares,
+        'avg_cost_per_share': book.avg_cost_per_share,
+        'total_cost': book.open_cost,
+        'realized_pnl': book.realized_pnl,
+        'position_type': 'Long',
         'trade_count': len(trades),
-        'buy_count': len(buy_trades),
-        'sell_count': len(sell_trades)
+        'buy_count': book.buy_count,
+        'sell_count': book.sell_count
     }
 
-def get_all_positions():
-    """Fetch and aggregate positions from all wallets with progress indicator"""
+@st.cache_resource
+def get_settlement_state():
+    """Process-wide throttle so settlement passes run once per SETTLEMENT_INTERVAL across sessions"""
+    return {'lock': threading.Lock(), 'last_run': 0.0}
+
+def settle_closed_markets(wallets):
+    """Settle closed markets for every wallet from its own lookback window of trades.
+
+    Each settled position is folded into its wallet's materialized stats once,
+    so rankings never need to be recomputed from trade history.
+    """
+    state = get_settlement_state()
+    if time.time() - state['last_run'] < SETTLEMENT_INTERVAL or not state['lock'].acquire(blocking=False):
+        return
+    try:
+        state['last_run'] = time.time()
+        store = get_trade_store()
+        since, min_slug_date = settlement_window()
+        for wallet_obj in wallets:
+            if isinstance(wallet_obj, dict):
+                wallet_address = wallet_obj['address']
+                wallet_label = wallet_obj.get('label') or wallet_address[:10]
+            else:
+                wallet_address = wallet_obj
+                wallet_label = wallet_address[:10]
+            try:
+                trades = load_settlement_trades(store, wallet_address, since, STORE_MAX_AGE)
+                settle_wallet(store, wallet_address, wallet_label, trades, fetch_market_info, min_slug_date)
+            except Exception:
+                # Retried on the next pass - nothing is recorded for a wallet whose history failed to load
+                continue
+    except Exception:
+        pass
+    finally:
+        state['lock'].release()
+
+def load_wallet_stats():
+    """Materialized per-wallet performance from settled markets"""
+    try:
+        return get_trade_store().wallet_stats()
+    except Exception:
+        return []
+
+def get_all_positions(fresh=False):
+    """Fetch and aggregate positions from all wallets with progress indicator.
+
+    fresh bypasses the trade store and the prefetcher, so every trade and market comes from the API.
+    """
     # Always use hardcoded wallets + any from session state
     wallets = st.session_state.wallets if st.session_state.wallets else load_wallets()
     if not wallets:
@@ -452,15 +379,21 @@ def get_all_positions():
     progress_bar = st.progress(0)
     status_text = st.empty()
     
+    # Right after a restart, let the warm-up pass finish rather than fanning out a second time
+    if prefetcher is not None and not fresh and not prefetcher.warmed.is_set():
+        status_text.text("Warming up caches...")
+        prefetcher.warmed.wait(PREFETCH_WARMUP_WAIT)
+    
     total_wallets = len(wallets)
     markets_dict = {}
+    cost_basis_method = st.session_state.get('cost_basis_method', DEFAULT_COST_BASIS_METHOD)
     
     # Fetch trades for each wallet with progress
     all_trades_by_wallet = {}
     for idx, wallet_obj in enumerate(wallets):
         if isinstance(wallet_obj, dict):
             wallet_address = wallet_obj['address']
-            wallet_label = wallet_obj.get('label', wallet_address[:10])
+            wallet_label = wallet_obj.get('label') or wallet_address[:10]
         else:
             wallet_address = wallet_obj
             wallet_label = wallet_address[:10]
@@ -468,31 +401,27 @@ def get_all_positions():
         status_text.text(f"Fetching trades for {wallet_label}... ({idx+1}/{total_wallets})")
         progress_bar.progress((idx + 0.2) / total_wallets)
         
-        trades = fetch_polymarket_trades(wallet_address)
+        trades = fetch_polymarket_trades(wallet_address, fresh)
         all_trades_by_wallet[wallet_label] = {
             'address': wallet_address,
             'trades': trades
         }
     
-    # Collect all unique condition IDs for price checking
+    # Index markets by condition_id and group them into events (built once here at ingest)
     status_text.text("Checking market prices...")
     progress_bar.progress(0.5)
     
-    all_condition_ids = set()
-    for wallet_label, wallet_data in all_trades_by_wallet.items():
-        trades = wallet_data['trades']
-        for trade in trades:
-            condition_id = trade.get('condition_id') or trade.get('conditionId')
-            if condition_id:
-                all_condition_ids.add(condition_id)
+    market_index = build_market_index(all_trades_by_wallet)
+    all_condition_ids = set(market_index.markets)
     
     # Batch check prices for resolved markets (price <= 5c or >= 95c)
     resolved_condition_ids = set()
     market_info_cache = {}
     
     for condition_id in all_condition_ids:
-        market_info = fetch_market_info(condition_id)
+        market_info = fetch_market_info(condition_id, fresh)
         market_info_cache[condition_id] = market_info
+        market_index.set_market_info(condition_id, market_info)
         
         # Check if market is resolved
         is_resolved = False
@@ -516,10 +445,10 @@ def get_all_positions():
         # If still not resolved and no prices, try CLOB API as fallback (most reliable)
         if not is_resolved and not prices:
             try:
-                url = f"https://clob.polymarket.com/markets/{condition_id}"
-                response = requests.get(url, timeout=2)
+                url = f"{CLOB_API_URL}/markets/{condition_id}"
+                response = http_get(url, timeout=2)
                 if response.status_code == 200:
-                    market = response.json()
+                    market = parse_json(response)
                     # Check closed status - this is the definitive field
                     if market.get('closed') is True:
                         is_resolved = True
@@ -545,6 +474,10 @@ def get_all_positions():
         if is_resolved:
             resolved_condition_ids.add(condition_id)
     
+    # Settle closed markets so per-wallet performance stats stay current
+    status_text.text("Settling closed markets...")
+    settle_closed_markets(wallets)
+    
     # Now process only active markets (already filtered by date via eventSlug, now filter by price)
     status_text.text("Processing active positions...")
     progress_bar.progress(0.7)
@@ -562,45 +495,50 @@ def get_all_positions():
         if not active_trades:
             continue
         
-        # Group trades by market and outcome
+        # Group trades by market (condition_id, so same-titled markets don't collide) and outcome
         market_outcome_trades = {}
         for trade in active_trades:
             market_name = trade.get('market_name') or trade.get('market') or trade.get('conditionId') or trade.get('condition_id') or 'Unknown Market'
             condition_id = trade.get('condition_id') or trade.get('conditionId') or trade.get('market')
             outcome = trade.get('outcome') or trade.get('outcomeName', 'Unknown')
             market_date = trade.get('market_date')
+            market_key = condition_id or market_name
             
-            if market_name not in market_outcome_trades:
-                market_outcome_trades[market_name] = {'date': market_date, 'outcomes': {}, 'condition_id': condition_id}
+            if market_key not in market_outcome_trades:
+                market_outcome_trades[market_key] = {'name': market_name, 'date': market_date, 'outcomes': {}, 'condition_id': condition_id}
             
-            if outcome not in market_outcome_trades[market_name]['outcomes']:
-                market_outcome_trades[market_name]['outcomes'][outcome] = []
+            if outcome not in market_outcome_trades[market_key]['outcomes']:
+                market_outcome_trades[market_key]['outcomes'][outcome] = []
             
             trade['wallet_address'] = wallet_address
             trade['wallet_label'] = wallet_label
             trade['condition_id'] = condition_id
-            market_outcome_trades[market_name]['outcomes'][outcome].append(trade)
+            market_outcome_trades[market_key]['outcomes'][outcome].append(trade)
         
         # Aggregate positions for each market
-        for market_name, market_data in market_outcome_trades.items():
-            if market_name not in markets_dict:
+        for market_key, market_data in market_outcome_trades.items():
+            if market_key not in markets_dict:
                 condition_id = market_data.get('condition_id')
-                markets_dict[market_name] = {
+                indexed_market = market_index.markets.get(condition_id, {})
+                markets_dict[market_key] = {
+                    'name': market_data.get('name'),
                     'date': market_data.get('date'),
                     'wallets': {},
                     'market_info': market_info_cache.get(condition_id) if condition_id else None,
-                    'condition_id': condition_id
+                    'condition_id': condition_id,
+                    'event_slug': indexed_market.get('event_slug')
                 }
             
             outcome_positions = {}
             for outcome, trades_list in market_data['outcomes'].items():
-                position = aggregate_position(trades_list)
+                position = aggregate_position(trades_list, cost_basis_method)
                 if position:
                     outcome_positions[outcome] = position
             
             if outcome_positions:
                 best_outcome = max(outcome_positions.items(), key=lambda x: x[1]['total_cost'])
-                markets_dict[market_name]['wallets'][wallet_label] = best_outcome[1]
+                best_outcome[1]['wallet_address'] = wallet_address
+                markets_dict[market_key]['wallets'][wallet_label] = best_outcome[1]
     
     # Convert to list format (markets_dict already contains only active markets)
     status_text.text("Finalizing positions...")
@@ -608,15 +546,18 @@ def get_all_positions():
     
     markets_list = []
     
-    for market_name, market_data in markets_dict.items():
+    for market_key, market_data in markets_dict.items():
         wallet_positions = market_data.get('wallets', {})
         market_date_str = market_data.get('date')
         
         # All markets in markets_dict are already active (filtered above)
         if wallet_positions:
+            market_index.set_positions(market_data['condition_id'], wallet_positions)
             markets_list.append({
-                'market_name': market_name,
+                'market_name': market_data['name'],
                 'market_date': market_date_str,
+                'condition_id': market_data['condition_id'],
+                'event_slug': market_data['event_slug'],
                 'wallets': wallet_positions,
                 'wallet_count': len(wallet_positions)
             })
@@ -632,10 +573,183 @@ def get_all_positions():
     status_text.empty()
     progress_bar.empty()
     
+    st.session_state.market_index = market_index
+    
     return markets_list
 
+def iter_position_export_rows(positions, wallet_addresses=None, start_date=None, end_date=None):
+    """Yield one export row per wallet position, optionally filtered by wallet and market date"""
+    for market in positions:
+        market_date_str = market.get('market_date')
+        if (start_date or end_date) and market_date_str:
+            try:
+                market_date = datetime.strptime(market_date_str[:10], '%Y-%m-%d').date()
+            except ValueError:
+                market_date = None
+            if market_date and start_date and market_date < start_date:
+                continue
+            if market_date and end_date and market_date > end_date:
+                continue
+
+        for wallet_label, position in market['wallets'].items():
+            if wallet_addresses is not None and position['wallet_address'] not in wallet_addresses:
+                continue
+            yield {
+                'Market Name': market['market_name'],
+                'Market Date': market_date_str,
+                'Wallet Label': wallet_label,
+                'Outcome': position['outcome'],
+                'Total Shares': position['total_shares'],
+                'Avg Cost Per Share': position['avg_cost_per_share'],
+                'Total Cost': position['total_cost'],
+                'Realized PnL': position['realized_pnl'],
+                'Trade Count': position['trade_count']
+            }
+
+def iter_trade_export_rows(wallets, start_date=None, end_date=None):
+    """Yield one export row per raw trade, paging through each wallet's full history.
+
+    A page that fails to load raises, so the download fails instead of silently truncating.
+    """
+    for wallet_obj in wallets:
+        if isinstance(wallet_obj, dict):
+            wallet_address = wallet_obj['address']
+            wallet_label = wallet_obj.get('label') or wallet_address[:10]
+        else:
+            wallet_address = wallet_obj
+            wallet_label = wallet_address[:10]
+
+        for page in iter_trade_pages(wallet_address, page_size=EXPORT_TRADES_PAGE_SIZE):
+            reached_start = False
+            for trade in page:
+                timestamp = trade.get('timestamp')
+                trade_time = None
+                if timestamp:
+                    try:
+                        trade_time = datetime.fromtimestamp(int(timestamp))
+                    except (ValueError, TypeError, OverflowError):
+                        trade_time = None
+
+                if trade_time and end_date and trade_time.date() > end_date:
+                    continue
+                if trade_time and start_date and trade_time.date() < start_date:
+                    # Pages are newest first, so everything after this is older too
+                    reached_start = True
+                    break
+
+                yield {
+                    'Timestamp': trade_time.isoformat() if trade_time else None,
+                    'Wallet Label': wallet_label,
+                    'Wallet Address': wallet_address,
+                    'Market Name': trade.get('title') or trade.get('marketName') or trade.get('market_name'),
+                    'Condition ID': trade.get('conditionId') or trade.get('condition_id') or trade.get('market'),
+                    'Event Slug': trade.get('eventSlug'),
+                    'Outcome': trade.get('outcome') or trade.get('outcomeName'),
+                    'Side': (trade.get('side', '') or '').upper(),
+                    'Size': float(trade.get('size', 0) or trade.get('amount', 0) or 0),
+                    'Price': float(trade.get('price', 0) or 0),
+                    'Transaction Hash': trade.get('transactionHash')
+                }
+            if reached_start:
+                break
+
+def iter_chunks(rows, chunk_size=EXPORT_CHUNK_SIZE):
+    """Group an iterator of rows into lists of at most chunk_size rows"""
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def write_export(rows, fields, export_format):
+    """Stream rows into a temporary file chunk by chunk and return it rewound for download"""
+    out = tempfile.TemporaryFile()
+    column_names = [name for name, _ in fields]
+
+    if export_format == 'Parquet':
+        parquet_types = {'str': pa.string(), 'float': pa.float64(), 'int': pa.int64()}
+        schema = pa.schema([(name, parquet_types[kind]) for name, kind in fields])
+        writer = pq.ParquetWriter(out, schema)
+        for chunk in iter_chunks(rows):
+            writer.write_table(pa.Table.from_pylist(chunk, schema=schema))
+        writer.close()
+    else:
+        text_out = io.TextIOWrapper(out, encoding='utf-8', newline='')
+        if export_format == 'CSV':
+            csv_writer = csv.DictWriter(text_out, fieldnames=column_names, lineterminator='\n')
+            csv_writer.writeheader()
+            for chunk in iter_chunks(rows):
+                csv_writer.writerows(chunk)
+        else:
+            for chunk in iter_chunks(rows):
+                text_out.write(''.join(json.dumps(row) + '\n' for row in chunk))
+        text_out.flush()
+        text_out.detach()
+
+    out.seek(0)
+    return out
+
+def build_positions_export(positions, export_format, wallet_addresses=None, start_date=None, end_date=None):
+    """Generate a position-level export file (called only when the download is clicked)"""
+    rows = iter_position_export_rows(positions, wallet_addresses, start_date, end_date)
+    return write_export(rows, POSITION_EXPORT_FIELDS, export_format)
+
+def build_trades_export(wallets, export_format, start_date=None, end_date=None):
+    """Generate a raw trade-level export file (called only when the download is clicked)"""
+    rows = iter_trade_export_rows(wallets, start_date, end_date)
+    return write_export(rows, TRADE_EXPORT_FIELDS, export_format)
+
 # Removed cached version - now using direct function with progress indicators
 
+# Sidebar ranking options -> wallet stats field
+RANKING_METRICS = {
+    'ROI': 'roi',
+    'Win Rate': 'win_rate',
+    'Realized PnL': 'pnl',
+    'Volume': 'volume',
+}
+
+def render_market(market, sorted_wallet_labels, total_wallets):
+    """Render one market with a column per wallet, highlighted when several wallets hold it"""
+    wallet_count = market['wallet_count']
+    
+    # Determine highlight style
+    highlight_style = ""
+    if total_wallets >= 3:
+        if wallet_count >= 3:
+            highlight_style = "background-color: rgba(76, 175, 80, 0.2); border-left: 3px solid #4caf50; padding: 10px;"
+        elif wallet_count >= 2:
+            highlight_style = "background-color: rgba(255, 193, 7, 0.2); border-left: 3px solid #ffc107; padding: 10px;"
+    
+    with st.container():
+        if highlight_style:
+            st.markdown(f'<div style="{highlight_style}">', unsafe_allow_html=True)
+        
+        st.markdown(f"### {market['market_name']}")
+        
+        cols = st.columns(len(sorted_wallet_labels))
+        for idx, wallet_label in enumerate(sorted_wallet_labels):
+            with cols[idx]:
+                position = market['wallets'].get(wallet_label)
+                if position:
+                    st.markdown(f"**{wallet_label}**")
+                    st.markdown(f"Outcome: {position['outcome']}")
+                    st.markdown(f"Shares: {position['total_shares']:.4f}")
+                    st.markdown(f"Avg Cost: ${position['avg_cost_per_share']:.4f}")
+                    st.markdown(f"Total Cost: ${position['total_cost']:.4f}")
+                    if position['sell_count']:
+                        st.markdown(f"Realized PnL: ${position['realized_pnl']:.4f}")
+                    st.caption(f"({position['trade_count']} trades)")
+                else:
+                    st.markdown("-")
+        
+        if highlight_style:
+            st.markdown('</div>', unsafe_allow_html=True)
+        st.divider()
+
 # Main app
 st.title("📊 SharpScout")
 st.markdown("**Polymarket Trade Scouting Dashboard**")
@@ -687,6 +801,15 @@ with st.sidebar:
     else:
         st.info("No wallets added yet")
     
+    # Position accounting
+    st.divider()
+    st.selectbox(
+        "Cost basis",
+        list(COST_BASIS_METHODS.keys()),
+        format_func=COST_BASIS_METHODS.get,
+        key="cost_basis_method"
+    )
+    
     # Backup button
     st.divider()
     if os.path.exists(WALLETS_FILE):
@@ -704,49 +827,96 @@ if not st.session_state.wallets:
 else:
     col1, col2 = st.columns([1, 1])
     with col1:
-        if st.button("🔄 Refresh Positions", use_container_width=True):
+        # Handled before positions are computed so a click costs a single fan-out, not one plus a rerun
+        refresh_clicked = st.button("🔄 Refresh Positions", use_container_width=True)
+        if refresh_clicked:
             # Clear all caches
             if 'market_cache' in st.session_state:
                 st.session_state.market_cache.clear()
             # Clear Streamlit cache
             st.cache_data.clear()
-            st.rerun()
+            # Don't serve the older prefetched copies on later reruns either
+            if prefetcher is not None:
+                prefetcher.invalidate()
+    
+    # Network/parse cost of this session's refresh (cache hits and prefetched data cost nothing)
+    with collect_http_stats() as refresh_stats:
+        positions = get_all_positions(fresh=refresh_clicked)
+    # Reruns served entirely from cache (widget changes) keep showing the last real refresh
+    if refresh_clicked or refresh_stats['requests'] > 0:
+        st.session_state.last_refresh_stats = refresh_stats
     
     with col2:
-        # Export CSV
-        positions = get_all_positions()
-        if positions:
-            # Prepare CSV data
-            csv_rows = []
-            for market in positions:
-                for wallet_label, position in market['wallets'].items():
-                    csv_rows.append({
-                        'Market Name': market['market_name'],
-                        'Wallet Label': wallet_label,
-                        'Outcome': position['outcome'],
-                        'Total Shares': position['total_shares'],
-                        'Avg Cost Per Share': position['avg_cost_per_share'],
-                        'Total Cost': position['total_cost'],
-                        'Trade Count': position['trade_count']
-                    })
-            
-            if csv_rows:
-                df = pd.DataFrame(csv_rows)
-                csv = df.to_csv(index=False)
-                st.download_button(
-                    label="📊 Export CSV",
-                    data=csv,
-                    file_name=f"polymarket_positions_{datetime.now().strftime('%Y%m%d')}.csv",
-                    mime="text/csv",
-                    use_container_width=True
+        # Export - files are only generated when the download button is clicked
+        with st.popover("📊 Export", use_container_width=True):
+            export_kind = st.radio("Export", ["Positions", "Raw trades"], horizontal=True, key="export_kind")
+            export_format = st.selectbox("Format", list(EXPORT_FORMATS.keys()), key="export_format")
+
+            # Keyed by address - labels can be blank or repeated
+            wallet_options = {}
+            for wallet_obj in st.session_state.wallets:
+                if isinstance(wallet_obj, dict):
+                    wallet_options[wallet_obj['address']] = wallet_obj
+                else:
+                    wallet_options[wallet_obj] = wallet_obj
+            selected_addresses = st.multiselect(
+                "Wallets (all if empty)",
+                list(wallet_options.keys()),
+                format_func=lambda address: (
+                    wallet_options[address].get('label') if isinstance(wallet_options[address], dict) else None
+                ) or address[:10],
+                key="export_wallets"
+            )
+            date_range = st.date_input("Date range (all if empty)", value=[], key="export_dates")
+
+            start_date = date_range[0] if len(date_range) > 0 else None
+            end_date = date_range[1] if len(date_range) > 1 else start_date
+            format_info = EXPORT_FORMATS[export_format]
+
+            if export_kind == "Positions":
+                export_data = partial(
+                    build_positions_export,
+                    positions,
+                    export_format,
+                    wallet_addresses=set(selected_addresses) if selected_addresses else None,
+                    start_date=start_date,
+                    end_date=end_date
                 )
-    
+                file_prefix = "polymarket_positions"
+            else:
+                export_wallets = [wallet_options[address] for address in selected_addresses] if selected_addresses else list(wallet_options.values())
+                export_data = partial(
+                    build_trades_export,
+                    export_wallets,
+                    export_format,
+                    start_date=start_date,
+                    end_date=end_date
+                )
+                file_prefix = "polymarket_trades"
+
+            st.download_button(
+                label=f"📥 Download {export_format}",
+                data=export_data,
+                file_name=f"{file_prefix}_{datetime.now().strftime('%Y%m%d')}.{format_info['extension']}",
+                mime=format_info['mime'],
+                use_container_width=True,
+                disabled=export_kind == "Positions" and not positions,
+                on_click="ignore"  # only the deferred builder runs - no rerun and position fan-out
+            )
+
     # Display positions
     st.divider()
     st.subheader("Positions by Market")
-    
-    positions = get_all_positions()
-    
+
+    refresh_stats = st.session_state.get('last_refresh_stats')
+    if refresh_stats:
+        st.caption(
+            f"Last refresh: {refresh_stats['requests']} API requests · "
+            f"{refresh_stats['wire_bytes'] / 1024:.1f} KB transferred "
+            f"({refresh_stats['body_bytes'] / 1024:.1f} KB uncompressed) · "
+            f"JSON parse {refresh_stats['parse_seconds'] * 1000:.1f} ms ({JSON_BACKEND})"
+        )
+
     if not positions:
         st.info("No positions found. Make sure wallets have trades and click Refresh Positions.")
     else:
@@ -791,42 +961,82 @@ else:
             table_data.append(row)
         
         if table_data:
-            # Display as a more readable format
-            for market in positions:
-                wallet_count = market['wallet_count']
-                
-                # Determine highlight style
-                highlight_style = ""
-                if total_wallets >= 3:
-                    if wallet_count >= 3:
-                        highlight_style = "background-color: rgba(76, 175, 80, 0.2); border-left: 3px solid #4caf50; padding: 10px;"
-                    elif wallet_count >= 2:
-                        highlight_style = "background-color: rgba(255, 193, 7, 0.2); border-left: 3px solid #ffc107; padding: 10px;"
+            view_col1, view_col2 = st.columns([1, 1])
+            with view_col1:
+                group_by_event = st.toggle("Group by event", key="group_by_event")
+            with view_col2:
+                starting_within = st.number_input(
+                    "Events starting within (hours, 0 = all)", min_value=0, value=0, step=1, key="starting_within_hours"
+                )
+            
+            market_index = st.session_state.get('market_index')
+            shown_positions = positions
+            if starting_within and market_index:
+                starting_soon = set(market_index.events_starting_within(starting_within))
+                shown_positions = [market for market in positions if market['event_slug'] in starting_soon]
+            
+            if not shown_positions:
+                st.info("No events start in that window.")
+            elif not group_by_event:
+                # Display as a more readable format
+                for market in shown_positions:
+                    render_market(market, sorted_wallet_labels, total_wallets)
+            else:
+                # One collapsible section per event (moneyline, spread, totals... of the same game)
+                event_markets = {}
+                for market in shown_positions:
+                    event_markets.setdefault(market['event_slug'], []).append(market)
                 
-                with st.container():
-                    if highlight_style:
-                        st.markdown(f'<div style="{highlight_style}">', unsafe_allow_html=True)
+                for event_slug, markets in sorted(event_markets.items(), key=lambda item: -sum(m['total_wager'] for m in item[1])):
+                    event_total = sum(market['total_wager'] for market in markets)
+                    event = market_index.events.get(event_slug) if market_index else None
+                    if event and event['info_start']:
+                        start_str = event['info_start'].strftime('%Y-%m-%d %H:%M UTC')
+                    else:
+                        start_str = markets[0]['market_date']
+                    title = f"{event_slug or 'Other markets'} · {start_str or 'date unknown'} · {len(markets)} markets · ${event_total:.2f}"
                     
-                    st.markdown(f"### {market['market_name']}")
-                    
-                    cols = st.columns(len(sorted_wallet_labels))
-                    for idx, wallet_label in enumerate(sorted_wallet_labels):
-                        with cols[idx]:
-                            position = market['wallets'].get(wallet_label)
-                            if position:
-                                st.markdown(f"**{wallet_label}**")
-                                st.markdown(f"Outcome: {position['outcome']}")
-                                st.markdown(f"Shares: {position['total_shares']:.4f}")
-                                st.markdown(f"Avg Cost: ${position['avg_cost_per_share']:.4f}")
-                                st.markdown(f"Total Cost: ${position['total_cost']:.4f}")
-                                st.caption(f"({position['trade_count']} trades)")
-                            else:
-                                st.markdown("-")
-                    
-                    if highlight_style:
-                        st.markdown('</div>', unsafe_allow_html=True)
-                    st.divider()
-
-
-
+                    with st.expander(title):
+                        if market_index and event_slug:
+                            exposure = market_index.event_exposure(event_slug)
+                            st.caption(" · ".join(
+                                f"{wallet_label}: ${wallet_exposure['total_cost']:.2f} over {wallet_exposure['markets']} markets"
+                                for wallet_label, wallet_exposure in sorted(exposure.items(), key=lambda item: -item[1]['total_cost'])
+                            ))
+                        for market in markets:
+                            render_market(market, sorted_wallet_labels, total_wallets)
 
+# Wallet rankings (after positions are processed so newly settled markets are included)
+with st.sidebar:
+    st.divider()
+    st.subheader("Wallet Rankings")
+    wallet_stats = load_wallet_stats()
+    if wallet_stats:
+        rank_by = st.selectbox("Rank by", list(RANKING_METRICS.keys()), key="rank_by")
+        wallet_stats.sort(key=lambda stats: -stats[RANKING_METRICS[rank_by]])
+        st.dataframe(
+            [
+                {
+                    'Wallet': stats['wallet_label'] or stats['wallet_address'][:10],
+                    'ROI': stats['roi'] * 100,
+                    'Win Rate': stats['win_rate'] * 100,
+                    'PnL': stats['pnl'],
+                    'Volume': stats['volume'],
+                    'Avg Entry': stats['avg_entry_price'],
+                    'Avg Settle': stats['avg_settlement_price'],
+                    'Positions': stats['positions'],
+                }
+                for stats in wallet_stats
+            ],
+            hide_index=True,
+            column_config={
+                'ROI': st.column_config.NumberColumn(format="%.1f%%"),
+                'Win Rate': st.column_config.NumberColumn(format="%.0f%%"),
+                'PnL': st.column_config.NumberColumn(format="$%.2f"),
+                'Volume': st.column_config.NumberColumn(format="$%.2f"),
+                'Avg Entry': st.column_config.NumberColumn(format="$%.3f"),
+                'Avg Settle': st.column_config.NumberColumn(format="$%.3f"),
+            }
+        )
+    else:
+        st.caption("No settled markets yet")
@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta, timezone
+
+from market_index import MarketIndex
+
+NOW = datetime(2026, 10, 18, 18, 0, tzinfo=timezone.utc)
+
+def add_market(index, condition_id, event_slug, market_date, game_start_time=None):
+    index.add_trade({'condition_id': condition_id, 'eventSlug': event_slug, 'market_date': market_date})
+    index.set_market_info(condition_id, {
+        'name': condition_id,
+        'date': '2026-10-31T00:00:00Z',  # end date - must not be used as the start time
+        'game_start_time': game_start_time,
+    })
+
+def test_slug_dated_event_today_counts_as_starting_now():
+    index = MarketIndex()
+    add_market(index, 'c1', 'nba-lal-bos-2026-10-18', '2026-10-18')
+
+    assert index.events_starting_within(24, now=NOW) == ['nba-lal-bos-2026-10-18']
+    assert index.events_starting_within(1, now=NOW) == ['nba-lal-bos-2026-10-18']
+
+def test_started_event_counts_as_starting_now():
+    index = MarketIndex()
+    add_market(index, 'c1', 'nfl-kc-buf-2026-10-18', '2026-10-18', '2026-10-18T17:00:00Z')
+
+    assert index.events_starting_within(1, now=NOW) == ['nfl-kc-buf-2026-10-18']
+
+def test_game_start_time_is_used_over_end_date():
+    index = MarketIndex()
+    add_market(index, 'c1', 'nhl-nj-ott-2026-10-19', '2026-10-19', '2026-10-19T23:00:00Z')
+
+    event = index.events['nhl-nj-ott-2026-10-19']
+    assert event['start_time'] == datetime(2026, 10, 19, 23, 0, tzinfo=timezone.utc)
+    assert index.events_starting_within(24, now=NOW) == []
+    assert index.events_starting_within(30, now=NOW) == ['nhl-nj-ott-2026-10-19']
+
+def test_events_are_returned_soonest_first_and_share_markets():
+    index = MarketIndex()
+    add_market(index, 'late', 'late-game-2026-10-18', '2026-10-18', '2026-10-18T23:00:00Z')
+    add_market(index, 'early', 'early-game-2026-10-18', '2026-10-18', '2026-10-18T20:00:00Z')
+    add_market(index, 'early-spread', 'early-game-2026-10-18', '2026-10-18', '2026-10-18T20:00:00Z')
+
+    assert index.events_starting_within(6, now=NOW) == ['early-game-2026-10-18', 'late-game-2026-10-18']
+    assert [m['condition_id'] for m in index.markets_for_event('early-game-2026-10-18')] == ['early', 'early-spread']
+    assert index.events_starting_within(6, now=NOW - timedelta(days=1)) == []
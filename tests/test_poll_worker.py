@@ -0,0 +1,105 @@
+import time
+
+import pytest
+
+import poll_worker
+from poll_worker import PollWorker, load_published_wallets
+from trade_store import SQLiteStore, shard_for_wallet
+
+LEASE_TTL = 0.5
+NUM_SHARDS = 8
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLiteStore(str(tmp_path / 'sharpscout.db'))
+
+def make_worker(store, worker_id, wallets=()):
+    return PollWorker(store, wallet_loader=lambda: list(wallets), num_shards=NUM_SHARDS,
+                      lease_ttl=LEASE_TTL, worker_id=worker_id)
+
+def test_lease_is_exclusive_until_it_expires(store):
+    assert store.acquire_lease(0, 'a', LEASE_TTL)
+    assert not store.acquire_lease(0, 'b', LEASE_TTL)
+    # The owner can renew
+    assert store.acquire_lease(0, 'a', LEASE_TTL)
+
+    time.sleep(LEASE_TTL + 0.1)
+    assert store.acquire_lease(0, 'b', LEASE_TTL)
+    assert not store.acquire_lease(0, 'a', LEASE_TTL)
+
+def test_released_lease_is_free_immediately(store):
+    assert store.acquire_lease(3, 'a', LEASE_TTL)
+    store.release_lease(3, 'b')  # not the owner - no effect
+    assert not store.acquire_lease(3, 'b', LEASE_TTL)
+    store.release_lease(3, 'a')
+    assert store.acquire_lease(3, 'b', LEASE_TTL)
+
+def test_two_workers_split_shards_evenly(store):
+    first = make_worker(store, 'first')
+    second = make_worker(store, 'second')
+
+    first.rebalance()
+    assert len(first.owned_shards) == NUM_SHARDS
+
+    # second joins: first gives up its extras on its next pass, second claims them on its next
+    second.rebalance()
+    first.rebalance()
+    second.rebalance()
+
+    assert len(first.owned_shards) == len(second.owned_shards) == NUM_SHARDS // 2
+    assert first.owned_shards.isdisjoint(second.owned_shards)
+
+def test_dead_workers_shards_fail_over_after_expiry(store):
+    first = make_worker(store, 'first')
+    second = make_worker(store, 'second')
+    first.rebalance()
+    second.rebalance()
+    first.rebalance()
+    second.rebalance()
+
+    # first stops heartbeating and renewing; its leases are held until they expire
+    second.rebalance()
+    assert len(second.owned_shards) == NUM_SHARDS // 2
+
+    time.sleep(LEASE_TTL + 0.1)
+    second.rebalance()
+    assert len(second.owned_shards) == NUM_SHARDS
+    assert store.live_workers() == ['second']
+
+def test_renew_drops_leases_taken_over_after_expiry(store):
+    first = make_worker(store, 'first')
+    first.rebalance()
+    time.sleep(LEASE_TTL + 0.1)
+    assert store.acquire_lease(0, 'second', LEASE_TTL)
+
+    first.renew_leases()
+    assert 0 not in first.owned_shards
+    assert len(first.owned_shards) == NUM_SHARDS - 1
+
+def test_poll_once_only_polls_wallets_in_owned_shards(store, monkeypatch):
+    wallets = [{'address': f'0x{i:040x}', 'label': f'w{i}'} for i in range(20)]
+    first = make_worker(store, 'first', wallets)
+    second = make_worker(store, 'second', wallets)
+    first.rebalance()
+    second.rebalance()
+
+    fetched = []
+    monkeypatch.setattr(poll_worker, 'fetch_trades', lambda address: fetched.append(address) or [])
+    first.poll_once()
+    second.poll_once()
+
+    assert sorted(fetched) == sorted(w['address'] for w in wallets)
+    for address in fetched:
+        assert store.last_polled(address) is not None
+    owned_by_first = {w['address'] for w in wallets if shard_for_wallet(w['address'], NUM_SHARDS) in first.owned_shards}
+    assert set(fetched[:len(owned_by_first)]) == owned_by_first
+
+def test_workers_load_the_published_wallet_list(store, monkeypatch):
+    monkeypatch.setattr(poll_worker, 'load_wallets', lambda: [{'address': '0xlocal', 'label': 'local'}])
+    assert load_published_wallets(store) == [{'address': '0xlocal', 'label': 'local'}]
+
+    store.publish_wallets([{'address': '0xAAA', 'label': 'A'}, {'address': '0xbbb'}])
+    assert load_published_wallets(store) == [{'address': '0xAAA', 'label': 'A'}, {'address': '0xbbb', 'label': ''}]
+
+    worker = PollWorker(store, num_shards=1)
+    assert worker.wallets_by_shard() == {0: ['0xAAA', '0xbbb']}
@@ -0,0 +1,130 @@
+import pytest
+
+from positions import SHARE_EPSILON, PositionBook, build_position_book, chronological, parse_trade
+
+def make_trade(side, size, price, timestamp, outcome='Yes'):
+    return {'side': side, 'size': size, 'price': price, 'timestamp': timestamp, 'outcome': outcome}
+
+def newest_first(*trades):
+    """Trades in the order the API returns them"""
+    return list(reversed(trades))
+
+def test_parse_trade_skips_trades_without_size_or_price():
+    assert parse_trade({'side': 'BUY', 'size': 0, 'price': 0.5}) is None
+    assert parse_trade({'side': 'BUY', 'size': 10, 'price': 0}) is None
+    assert parse_trade({'side': 'sell', 'amount': '4', 'priceNum': '0.25'}) == (False, 4.0, 0.25)
+
+def test_chronological_orders_oldest_first():
+    trades = newest_first(make_trade('BUY', 1, 0.1, 100), make_trade('BUY', 2, 0.2, 200))
+    assert [t['timestamp'] for t in chronological(trades)] == [100, 200]
+
+def test_unknown_method_is_rejected():
+    with pytest.raises(ValueError):
+        PositionBook('lifo')
+
+def test_fifo_sells_oldest_lots_first():
+    trades = newest_first(
+        make_trade('BUY', 10, 0.40, 1),
+        make_trade('BUY', 10, 0.60, 2),
+        make_trade('SELL', 15, 0.70, 3),
+    )
+    book = build_position_book(trades, 'fifo')
+
+    assert book.shares == pytest.approx(5)
+    assert book.open_cost == pytest.approx(5 * 0.60)
+    assert book.avg_cost_per_share == pytest.approx(0.60)
+    assert book.realized_pnl == pytest.approx(10 * (0.70 - 0.40) + 5 * (0.70 - 0.60))
+    assert (book.buy_count, book.sell_count) == (2, 1)
+
+def test_average_cost_sells_at_blended_basis():
+    trades = newest_first(
+        make_trade('BUY', 10, 0.40, 1),
+        make_trade('BUY', 10, 0.60, 2),
+        make_trade('SELL', 15, 0.70, 3),
+    )
+    book = build_position_book(trades, 'average')
+
+    assert len(book.lots) == 1
+    assert book.shares == pytest.approx(5)
+    assert book.avg_cost_per_share == pytest.approx(0.50)
+    assert book.open_cost == pytest.approx(5 * 0.50)
+    assert book.realized_pnl == pytest.approx(15 * (0.70 - 0.50))
+
+def test_fifo_and_average_agree_once_fully_closed():
+    trades = newest_first(
+        make_trade('BUY', 10, 0.40, 1),
+        make_trade('BUY', 10, 0.60, 2),
+        make_trade('SELL', 20, 0.55, 3),
+    )
+    fifo = build_position_book(trades, 'fifo')
+    average = build_position_book(trades, 'average')
+
+    assert fifo.realized_pnl == pytest.approx(average.realized_pnl)
+    assert fifo.shares == average.shares == 0
+    assert fifo.open_cost == average.open_cost == 0
+
+def test_sells_beyond_known_buys_are_unmatched_not_short():
+    trades = newest_first(
+        make_trade('BUY', 5, 0.50, 1),
+        make_trade('SELL', 8, 0.60, 2),
+    )
+    book = build_position_book(trades)
+
+    assert book.shares == 0
+    assert book.open_cost == 0
+    assert book.unmatched_shares == pytest.approx(3)
+    # Only the matched shares have a known basis
+    assert book.realized_pnl == pytest.approx(5 * (0.60 - 0.50))
+
+def test_sell_with_no_buys_is_entirely_unmatched():
+    book = build_position_book([make_trade('SELL', 4, 0.30, 1)])
+
+    assert book.shares == 0
+    assert book.realized_pnl == 0
+    assert book.unmatched_shares == pytest.approx(4)
+
+def test_dust_left_by_partial_fills_closes_the_position():
+    dust = SHARE_EPSILON / 2
+    trades = newest_first(
+        make_trade('BUY', 10, 0.50, 1),
+        make_trade('SELL', 10 - dust, 0.60, 2),
+    )
+    book = build_position_book(trades)
+
+    assert not book.lots
+    assert book.shares == 0
+    assert book.open_cost == 0
+    assert book.avg_cost_per_share == 0
+    assert book.unmatched_shares == 0
+
+def test_dust_oversell_is_not_counted_as_unmatched():
+    dust = SHARE_EPSILON / 2
+    trades = newest_first(
+        make_trade('BUY', 10, 0.50, 1),
+        make_trade('SELL', 10 + dust, 0.60, 2),
+    )
+    book = build_position_book(trades)
+
+    assert book.shares == 0
+    assert book.unmatched_shares == 0
+
+@pytest.mark.parametrize('method', ['fifo', 'average'])
+def test_buy_only_matches_previous_aggregation(method):
+    trades = newest_first(
+        make_trade('BUY', 12.5, 0.41, 1),
+        make_trade('BUY', 3, 0.38, 2),
+        make_trade('BUY', 0, 0.50, 3),  # skipped: no size
+        make_trade('BUY', 7.25, 0.47, 4),
+    )
+    book = build_position_book(trades, method)
+
+    # Previous aggregate_position: sum of shares, sum of size * price, cost / shares
+    legacy_shares = 12.5 + 3 + 7.25
+    legacy_cost = 12.5 * 0.41 + 3 * 0.38 + 7.25 * 0.47
+    assert book.shares == pytest.approx(legacy_shares)
+    assert book.open_cost == pytest.approx(legacy_cost)
+    assert book.avg_cost_per_share == pytest.approx(legacy_cost / legacy_shares)
+    assert book.bought_shares == pytest.approx(legacy_shares)
+    assert book.bought_cost == pytest.approx(legacy_cost)
+    assert book.realized_pnl == 0
+    assert (book.buy_count, book.sell_count) == (3, 0)
@@ -0,0 +1,66 @@
+import time
+from datetime import date, datetime, timezone
+
+import prefetch
+from prefetch import PREFETCH_DEFAULT_INTERVAL, PREFETCH_SCHEDULE, Prefetcher, refresh_interval
+
+NOW = datetime(2026, 10, 18, 18, 0, tzinfo=timezone.utc)
+
+def test_start_time_uses_game_start_time_not_end_date():
+    entry = {
+        'data': {'date': '2026-10-31T00:00:00Z', 'game_start_time': '2026-10-18T19:30:00Z'},
+        'slug_date': date(2026, 10, 18),
+    }
+    assert Prefetcher._start_time(entry) == datetime(2026, 10, 18, 19, 30, tzinfo=timezone.utc)
+
+def test_start_time_falls_back_to_slug_date():
+    entry = {'data': {'date': '2026-10-31T00:00:00Z', 'game_start_time': None}, 'slug_date': date(2026, 10, 20)}
+    assert Prefetcher._start_time(entry) == datetime(2026, 10, 20, tzinfo=timezone.utc)
+
+def test_refresh_interval_follows_schedule():
+    soonest_interval = PREFETCH_SCHEDULE[0][1]
+    assert refresh_interval(datetime(2026, 10, 18, 19, 0, tzinfo=timezone.utc), NOW) == soonest_interval
+    # Started games are treated as starting now
+    assert refresh_interval(datetime(2026, 10, 18, 0, 0, tzinfo=timezone.utc), NOW) == soonest_interval
+    assert refresh_interval(None, NOW) == PREFETCH_DEFAULT_INTERVAL
+
+def test_invalidate_stops_serving_prefetched_data():
+    prefetcher = Prefetcher(lambda: [])
+    now = time.time()
+    prefetcher._trades['0xabc'] = {'data': [{'side': 'BUY'}], 'fetched_at': now, 'attempted_at': now}
+    prefetcher._markets['c1'] = {
+        'data': {'name': 'c1', 'game_start_time': None}, 'fetched_at': now, 'attempted_at': now,
+        'slug_date': date.today()
+    }
+    assert prefetcher.get_trades('0xABC') == [{'side': 'BUY'}]
+    assert prefetcher.get_market_info('c1') is not None
+
+    prefetcher.invalidate()
+
+    assert prefetcher.get_trades('0xabc') is None
+    assert prefetcher.get_market_info('c1') is None
+    assert prefetcher._trades['0xabc']['attempted_at'] == 0
+
+def test_failed_market_refresh_keeps_previous_data(monkeypatch):
+    prefetcher = Prefetcher(lambda: [])
+    good = {'name': 'Lakers vs. Celtics', 'game_start_time': None, 'prices': {'Yes': 0.55, 'No': 0.45}}
+    prefetcher._markets['c1'] = {'data': good, 'fetched_at': 100.0, 'attempted_at': 100.0, 'slug_date': date.today()}
+    placeholder = {'name': 'c1', 'date': None, 'game_start_time': None, 'prices': {}, 'resolved': False, 'closed': False}
+    monkeypatch.setattr(prefetch, 'fetch_market_details', lambda condition_id: placeholder)
+
+    prefetcher._refresh_market('c1')
+
+    entry = prefetcher._markets['c1']
+    assert entry['data'] is good
+    assert entry['fetched_at'] == 100.0
+    assert entry['attempted_at'] > 100.0
+
+def test_market_refresh_replaces_data(monkeypatch):
+    prefetcher = Prefetcher(lambda: [])
+    prefetcher._markets['c1'] = {'data': None, 'fetched_at': 0, 'attempted_at': 0, 'slug_date': date.today()}
+    fresh = {'name': 'Lakers vs. Celtics', 'game_start_time': None, 'prices': {'Yes': 0.6, 'No': 0.4}}
+    monkeypatch.setattr(prefetch, 'fetch_market_details', lambda condition_id: fresh)
+
+    prefetcher._refresh_market('c1')
+
+    assert prefetcher.get_market_info('c1') is fresh
@@ -0,0 +1,109 @@
+import time
+from datetime import date, datetime
+
+import pytest
+
+import settlement
+from settlement import load_settlement_trades, settle_wallet, settlement_window, winning_outcome
+from trade_store import SQLiteStore
+
+WALLET = '0x0000000000000000000000000000000000000abc'
+TODAY = date(2026, 10, 18)
+MIN_SLUG_DATE = date(2026, 9, 25)
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLiteStore(str(tmp_path / 'sharpscout.db'))
+
+def make_trade(condition_id, slug_date, side, size, price, timestamp, outcome='Yes'):
+    return {
+        'conditionId': condition_id, 'eventSlug': f'nba-lal-bos-{slug_date}', 'outcome': outcome,
+        'side': side, 'size': size, 'price': price, 'timestamp': timestamp,
+    }
+
+def closed(winner_price=1.0, is_closed=True):
+    return {'closed': is_closed, 'prices': {'Yes': winner_price, 'No': round(1 - winner_price, 2)}}
+
+def test_winning_outcome_needs_a_closed_market_near_one_dollar():
+    assert winning_outcome(closed(0.995)) == 'Yes'
+    assert winning_outcome(closed(0.96)) is None
+    assert winning_outcome(closed(1.0, is_closed=False)) is None
+    assert winning_outcome(None) is None
+
+def test_settles_late_closing_market_from_past_slug_date(store):
+    trades = [
+        make_trade('c1', '2026-10-15', 'BUY', 10, 0.40, 2),
+        make_trade('c1', '2026-10-15', 'BUY', 10, 0.60, 1),
+    ]
+    settled = settle_wallet(store, WALLET, 'Sharp', trades, lambda cid: closed(), MIN_SLUG_DATE, today=TODAY)
+
+    assert settled == 1
+    [stats] = store.wallet_stats()
+    assert stats['volume'] == pytest.approx(10)
+    assert stats['pnl'] == pytest.approx(20 - 10)
+
+def test_skips_open_future_and_out_of_window_markets(store):
+    trades = [
+        make_trade('open', '2026-10-17', 'BUY', 1, 0.5, 1),
+        make_trade('future', '2026-10-19', 'BUY', 1, 0.5, 1),
+        make_trade('old', '2026-09-20', 'BUY', 1, 0.5, 1),
+        make_trade('no-slug', '', 'BUY', 1, 0.5, 1),
+    ]
+    loaded = []
+
+    def market_info(condition_id):
+        loaded.append(condition_id)
+        return closed(is_closed=condition_id != 'open')
+
+    assert settle_wallet(store, WALLET, 'Sharp', trades, market_info, MIN_SLUG_DATE, today=TODAY) == 0
+    assert loaded == ['open']
+    assert store.wallet_stats() == []
+
+def test_already_settled_markets_are_skipped_per_wallet(store):
+    trades = [make_trade('c1', '2026-10-15', 'BUY', 10, 0.40, 1)]
+    settle_wallet(store, WALLET, 'Sharp', trades, lambda cid: closed(), MIN_SLUG_DATE, today=TODAY)
+
+    loaded = []
+    assert settle_wallet(store, WALLET, 'Sharp', trades, loaded.append, MIN_SLUG_DATE, today=TODAY) == 0
+    assert loaded == []
+
+    # A wallet missing from the first pass still settles into the same market
+    other = '0x0000000000000000000000000000000000000def'
+    assert settle_wallet(store, other, 'Late', trades, lambda cid: closed(), MIN_SLUG_DATE, today=TODAY) == 1
+    assert len(store.wallet_stats()) == 2
+
+def test_settlement_window_leaves_room_for_market_lifetime():
+    since, min_slug_date = settlement_window(datetime(2026, 10, 18, 15, 0))
+    since_date = datetime.fromtimestamp(since).date()
+    assert (TODAY - since_date).days == settlement.SETTLEMENT_LOOKBACK_DAYS
+    assert (min_slug_date - since_date).days == settlement.MARKET_OPEN_DAYS
+
+def test_trades_come_from_store_when_recently_polled(store, monkeypatch):
+    now = int(time.time())
+    store.save_trades(WALLET, [
+        {'transactionHash': 'new', 'timestamp': now},
+        {'transactionHash': 'old', 'timestamp': now - 10_000},
+    ])
+    monkeypatch.setattr(settlement, 'iter_trade_pages', pytest.fail)
+
+    trades = load_settlement_trades(store, WALLET, since=now - 100, max_store_age=120)
+    assert [t['transactionHash'] for t in trades] == ['new']
+
+def test_trades_are_paged_from_api_until_window_is_covered(store, monkeypatch):
+    pages = [
+        [{'transactionHash': 'a', 'timestamp': 300}, {'transactionHash': 'b', 'timestamp': 200}],
+        [{'transactionHash': 'c', 'timestamp': 150}, {'transactionHash': 'd', 'timestamp': 50}],
+        [{'transactionHash': 'e', 'timestamp': 10}],
+    ]
+    requested = []
+
+    def iter_pages(wallet_address, page_size):
+        for page in pages:
+            requested.append(page)
+            yield page
+
+    monkeypatch.setattr(settlement, 'iter_trade_pages', iter_pages)
+    trades = load_settlement_trades(store, WALLET, since=100, max_store_age=120)
+
+    assert [t['transactionHash'] for t in trades] == ['a', 'b', 'c']
+    assert len(requested) == 2
@@ -0,0 +1,72 @@
+import pytest
+
+from settlement import settled_positions
+from trade_store import SQLiteStore, wallet_performance
+
+WALLET = '0xAbC0000000000000000000000000000000000001'
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLiteStore(str(tmp_path / 'sharpscout.db'))
+
+def make_trade(side, size, price, timestamp, outcome):
+    return {'side': side, 'size': size, 'price': price, 'timestamp': timestamp, 'outcome': outcome}
+
+def settle(store, condition_id, winner, outcome_trades):
+    store.record_settlement(condition_id, winner, settled_positions(WALLET, 'Sharp', outcome_trades, winner))
+
+def test_winning_position_and_partly_sold_loser(store):
+    # Bought 10 @ 40c and held to a $1 payout: +6.00
+    settle(store, 'c1', 'Yes', {'Yes': [make_trade('BUY', 10, 0.40, 1, 'Yes')]})
+    # Bought 10 @ 50c, sold 4 @ 60c (+0.40), the other 6 expire worthless (-3.00): -2.60
+    settle(store, 'c2', 'Yes', {'No': [make_trade('SELL', 4, 0.60, 2, 'No'), make_trade('BUY', 10, 0.50, 1, 'No')]})
+
+    [stats] = store.wallet_stats()
+    assert stats['wallet_address'] == WALLET.lower()
+    assert stats['wallet_label'] == 'Sharp'
+    assert stats['positions'] == 2
+    assert stats['wins'] == 1
+    assert stats['win_rate'] == pytest.approx(0.5)
+    assert stats['volume'] == pytest.approx(4 + 5)
+    assert stats['pnl'] == pytest.approx(6 - 2.6)
+    assert stats['roi'] == pytest.approx(3.4 / 9)
+    assert stats['avg_entry_price'] == pytest.approx(9 / 20)
+    assert stats['avg_settlement_price'] == pytest.approx((10 + 2.4) / 20)
+
+def test_winning_outcome_sold_at_a_loss_is_not_a_win(store):
+    trades = [make_trade('SELL', 10, 0.30, 2, 'Yes'), make_trade('BUY', 10, 0.60, 1, 'Yes')]
+    settle(store, 'c1', 'Yes', {'Yes': trades})
+
+    [stats] = store.wallet_stats()
+    assert stats['pnl'] == pytest.approx(-3)
+    assert stats['wins'] == 0
+
+def test_settling_a_market_twice_leaves_stats_unchanged(store):
+    outcome_trades = {'Yes': [make_trade('BUY', 10, 0.40, 1, 'Yes')]}
+    settle(store, 'c1', 'Yes', outcome_trades)
+    before = store.wallet_stats()
+
+    settle(store, 'c1', 'Yes', outcome_trades)
+    store.record_settlement('c1', 'No', [])
+
+    assert store.wallet_stats() == before
+    assert store.settled_condition_ids(WALLET, ['c1', 'c2']) == {'c1'}
+
+def test_other_wallets_can_still_settle_a_recorded_market(store):
+    settle(store, 'c1', 'Yes', {'Yes': [make_trade('BUY', 10, 0.40, 1, 'Yes')]})
+    store.record_settlement('c1', 'Yes', [{
+        'wallet_address': '0xdef', 'wallet_label': 'Late', 'outcome': 'No',
+        'shares': 5, 'cost': 2.5, 'payout': 0.0, 'pnl': -2.5
+    }])
+
+    stats = {s['wallet_label']: s for s in store.wallet_stats()}
+    assert stats['Late']['positions'] == 1
+    assert stats['Late']['pnl'] == pytest.approx(-2.5)
+    assert stats['Sharp']['positions'] == 1
+
+def test_wallet_performance_without_positions():
+    stats = wallet_performance({
+        'wallet_address': '0x1', 'wallet_label': '', 'positions': 0, 'wins': 0,
+        'volume': 0, 'shares': 0, 'payout': 0, 'pnl': 0
+    })
+    assert stats['roi'] == stats['win_rate'] == stats['avg_entry_price'] == stats['avg_settlement_price'] == 0
@@ -0,0 +1,387 @@
+"""Shared store for polling workers: wallet shard leases plus the trades they collect,
+and settled positions with the per-wallet performance aggregates built from them.
+
+Two backends with the same interface:
+- SQLiteStore: a local sqlite file (default) for workers on a single host. It relies on
+  WAL mode, which does not work over network filesystems, so don't put it on a shared volume
+- RedisStore: any Redis-compatible server - use this when workers run on more than one host
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from config import STORE_URL
+
+def shard_for_wallet(wallet_address, num_shards):
+    """Stable shard number for a wallet address"""
+    digest = hashlib.sha1(wallet_address.lower().encode('utf-8')).hexdigest()
+    return int(digest, 16) % num_shards
+
+def trade_key(trade):
+    """Unique key for a trade so re-polled trades are deduplicated"""
+    tx_hash = trade.get('transactionHash')
+    if tx_hash:
+        parts = [tx_hash, trade.get('asset') or trade.get('outcome'), trade.get('side'), trade.get('size'), trade.get('price')]
+        return ':'.join(str(p) for p in parts)
+    return hashlib.sha1(json.dumps(trade, sort_keys=True).encode('utf-8')).hexdigest()
+
+def wallet_performance(stats):
+    """Derived metrics (ROI, win rate, average entry vs settlement price) from raw wallet aggregates"""
+    positions = stats['positions']
+    volume = stats['volume']
+    shares = stats['shares']
+    return {
+        'wallet_address': stats['wallet_address'],
+        'wallet_label': stats['wallet_label'],
+        'positions': positions,
+        'wins': stats['wins'],
+        'win_rate': stats['wins'] / positions if positions else 0,
+        'volume': volume,
+        'pnl': stats['pnl'],
+        'roi': stats['pnl'] / volume if volume else 0,
+        'avg_entry_price': volume / shares if shares else 0,
+        'avg_settlement_price': stats['payout'] / shares if shares else 0
+    }
+
+class SQLiteStore:
+    """Leases, trades and settlements in a sqlite file - one short-lived connection per call"""
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS leases (
+                    shard INTEGER PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS workers (
+                    worker_id TEXT PRIMARY KEY,
+                    expires_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS trades (
+                    trade_key TEXT PRIMARY KEY,
+                    wallet_address TEXT NOT NULL,
+                    timestamp INTEGER,
+                    payload TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS trades_wallet_time ON trades (wallet_address, timestamp);
+                CREATE TABLE IF NOT EXISTS wallets (
+                    position INTEGER PRIMARY KEY,
+                    address TEXT NOT NULL,
+                    label TEXT
+                );
+                CREATE TABLE IF NOT EXISTS wallet_polls (
+                    wallet_address TEXT PRIMARY KEY,
+                    polled_at REAL NOT NULL,
+                    worker_id TEXT
+                );
+                CREATE TABLE IF NOT EXISTS settled_markets (
+                    condition_id TEXT PRIMARY KEY,
+                    winning_outcome TEXT NOT NULL,
+                    settled_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS settled_positions (
+                    wallet_address TEXT NOT NULL,
+                    condition_id TEXT NOT NULL,
+                    outcome TEXT NOT NULL,
+                    shares REAL NOT NULL,
+                    cost REAL NOT NULL,
+                    payout REAL NOT NULL,
+                    pnl REAL NOT NULL,
+                    PRIMARY KEY (wallet_address, condition_id, outcome)
+                );
+                CREATE TABLE IF NOT EXISTS wallet_stats (
+                    wallet_address TEXT PRIMARY KEY,
+                    wallet_label TEXT,
+                    positions INTEGER NOT NULL DEFAULT 0,
+                    wins INTEGER NOT NULL DEFAULT 0,
+                    volume REAL NOT NULL DEFAULT 0,
+                    shares REAL NOT NULL DEFAULT 0,
+                    payout REAL NOT NULL DEFAULT 0,
+                    pnl REAL NOT NULL DEFAULT 0
+                );
+            """)
+
+    @contextmanager
+    def _connect(self):
+        """Connection that commits on success and is always closed"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA busy_timeout=30000")
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def heartbeat(self, worker_id, ttl):
+        """Mark a worker as alive for ttl seconds"""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO workers (worker_id, expires_at) VALUES (?, ?)",
+                (worker_id, time.time() + ttl)
+            )
+
+    def remove_worker(self, worker_id):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM workers WHERE worker_id = ?", (worker_id,))
+
+    def live_workers(self):
+        """Ids of workers whose heartbeat hasn't expired"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT worker_id FROM workers WHERE expires_at > ?", (time.time(),)).fetchall()
+        return [row[0] for row in rows]
+
+    def acquire_lease(self, shard, owner, ttl):
+        """Take or renew a shard lease - succeeds if the shard is free, expired, or already ours"""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute("""
+                INSERT INTO leases (shard, owner, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT (shard) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+                WHERE leases.owner = excluded.owner OR leases.expires_at <= ?
+            """, (shard, owner, now + ttl, now))
+            return cursor.rowcount == 1
+
+    def release_lease(self, shard, owner):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM leases WHERE shard = ? AND owner = ?", (shard, owner))
+
+    def publish_wallets(self, wallets):
+        """Replace the shared wallet list that workers poll"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM wallets")
+            conn.executemany(
+                "INSERT INTO wallets (position, address, label) VALUES (?, ?, ?)",
+                [(position, wallet['address'], wallet.get('label') or '') for position, wallet in enumerate(wallets)]
+            )
+
+    def published_wallets(self):
+        """The shared wallet list as {'address', 'label'} dicts, or [] if none was published"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT address, label FROM wallets ORDER BY position").fetchall()
+        return [{'address': address, 'label': label} for address, label in rows]
+
+    def save_trades(self, wallet_address, trades, worker_id=None):
+        """Upsert polled trades for a wallet and record when it was polled"""
+        wallet_address = wallet_address.lower()
+        rows = [
+            (trade_key(trade), wallet_address, int(trade.get('timestamp') or 0), json.dumps(trade))
+            for trade in trades
+        ]
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO trades (trade_key, wallet_address, timestamp, payload) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO wallet_polls (wallet_address, polled_at, worker_id) VALUES (?, ?, ?)",
+                (wallet_address, time.time(), worker_id)
+            )
+
+    def last_polled(self, wallet_address):
+        """Unix time a worker last polled this wallet, or None"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT polled_at FROM wallet_polls WHERE wallet_address = ?", (wallet_address.lower(),)
+            ).fetchone()
+        return row[0] if row else None
+
+    def load_trades(self, wallet_address, since=None):
+        """Stored trades for a wallet made at or after the unix time `since` (all if None), newest first"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT payload FROM trades WHERE wallet_address = ? AND timestamp >= ? ORDER BY timestamp DESC",
+                (wallet_address.lower(), since or 0)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def settled_condition_ids(self, wallet_address, condition_ids):
+        """Which of condition_ids already have a settled position for this wallet"""
+        condition_ids = list(condition_ids)
+        if not condition_ids:
+            return set()
+        placeholders = ', '.join('?' * len(condition_ids))
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT DISTINCT condition_id FROM settled_positions WHERE wallet_address = ? AND condition_id IN ({placeholders})",
+                [wallet_address.lower()] + condition_ids
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def record_settlement(self, condition_id, winning_outcome, positions):
+        """Record a resolved market and fold each newly settled position into its wallet's aggregates.
+
+        positions: dicts with wallet_address, wallet_label, outcome, shares, cost, payout, pnl.
+        Positions already recorded are ignored, so settling the same market twice is harmless.
+        A position counts as a win when its pnl is positive - holding the winning outcome isn't
+        enough if the shares were sold at a loss first.
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO settled_markets (condition_id, winning_outcome, settled_at) VALUES (?, ?, ?)",
+                (condition_id, winning_outcome, time.time())
+            )
+            for position in positions:
+                wallet_address = position['wallet_address'].lower()
+                cursor = conn.execute("""
+                    INSERT OR IGNORE INTO settled_positions
+                        (wallet_address, condition_id, outcome, shares, cost, payout, pnl)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, (wallet_address, condition_id, position['outcome'], position['shares'],
+                      position['cost'], position['payout'], position['pnl']))
+                if cursor.rowcount != 1:
+                    continue
+                conn.execute("""
+                    INSERT INTO wallet_stats (wallet_address, wallet_label, positions, wins, volume, shares, payout, pnl)
+                    VALUES (?, ?, 1, ?, ?, ?, ?, ?)
+                    ON CONFLICT (wallet_address) DO UPDATE SET
+                        wallet_label = excluded.wallet_label,
+                        positions = positions + 1,
+                        wins = wins + excluded.wins,
+                        volume = volume + excluded.volume,
+                        shares = shares + excluded.shares,
+                        payout = payout + excluded.payout,
+                        pnl = pnl + excluded.pnl
+                """, (wallet_address, position.get('wallet_label'), int(position['pnl'] > 0),
+                      position['cost'], position['shares'], position['payout'], position['pnl']))
+
+    def wallet_stats(self):
+        """Performance of every wallet with settled positions"""
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute("SELECT * FROM wallet_stats").fetchall()
+        return [wallet_performance(dict(row)) for row in rows]
+
+class RedisStore:
+    """Leases, trades and settlements in a Redis-compatible server (requires the redis package)"""
+
+    PREFIX = 'sharpscout'
+
+    # Only touch a lease if we still own it
+    _RENEW_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('pexpire', KEYS[1], ARGV[2]) else return 0 end"
+    _RELEASE_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
+
+    def __init__(self, url):
+        import redis
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+
+    def _key(self, *parts):
+        return ':'.join([self.PREFIX] + [str(p) for p in parts])
+
+    def heartbeat(self, worker_id, ttl):
+        self.client.set(self._key('worker', worker_id), '1', px=int(ttl * 1000))
+
+    def remove_worker(self, worker_id):
+        self.client.delete(self._key('worker', worker_id))
+
+    def live_workers(self):
+        prefix = self._key('worker', '')
+        return [key[len(prefix):] for key in self.client.scan_iter(match=prefix + '*')]
+
+    def acquire_lease(self, shard, owner, ttl):
+        key = self._key('lease', shard)
+        ttl_ms = int(ttl * 1000)
+        if self.client.set(key, owner, nx=True, px=ttl_ms):
+            return True
+        return self.client.eval(self._RENEW_SCRIPT, 1, key, owner, ttl_ms) == 1
+
+    def release_lease(self, shard, owner):
+        self.client.eval(self._RELEASE_SCRIPT, 1, self._key('lease', shard), owner)
+
+    def publish_wallets(self, wallets):
+        self.client.set(self._key('wallets'), json.dumps([
+            {'address': wallet['address'], 'label': wallet.get('label') or ''} for wallet in wallets
+        ]))
+
+    def published_wallets(self):
+        value = self.client.get(self._key('wallets'))
+        return json.loads(value) if value else []
+
+    def save_trades(self, wallet_address, trades, worker_id=None):
+        wallet_address = wallet_address.lower()
+        pipe = self.client.pipeline()
+        if trades:
+            pipe.hset(self._key('trades', wallet_address), mapping={trade_key(t): json.dumps(t) for t in trades})
+            # Sorted set of trade keys by timestamp so load_trades can read just a recent window
+            pipe.zadd(
+                self._key('trade_times', wallet_address),
+                {trade_key(t): int(t.get('timestamp') or 0) for t in trades}
+            )
+        pipe.set(self._key('polled', wallet_address), time.time())
+        pipe.execute()
+
+    def last_polled(self, wallet_address):
+        value = self.client.get(self._key('polled', wallet_address.lower()))
+        return float(value) if value else None
+
+    def load_trades(self, wallet_address, since=None):
+        wallet_address = wallet_address.lower()
+        if since is None:
+            payloads = self.client.hvals(self._key('trades', wallet_address))
+        else:
+            keys = self.client.zrangebyscore(self._key('trade_times', wallet_address), since, '+inf')
+            payloads = self.client.hmget(self._key('trades', wallet_address), keys) if keys else []
+        trades = [json.loads(p) for p in payloads if p]
+        trades.sort(key=lambda t: int(t.get('timestamp') or 0), reverse=True)
+        return trades
+
+    def settled_condition_ids(self, wallet_address, condition_ids):
+        condition_ids = list(condition_ids)
+        if not condition_ids:
+            return set()
+        settled_key = self._key('settled', wallet_address.lower())
+        pipe = self.client.pipeline()
+        for condition_id in condition_ids:
+            pipe.sismember(settled_key, condition_id)
+        flags = pipe.execute()
+        return {condition_id for condition_id, flag in zip(condition_ids, flags) if flag}
+
+    def record_settlement(self, condition_id, winning_outcome, positions):
+        self.client.hsetnx(self._key('settled_markets'), condition_id, winning_outcome)
+        for position in positions:
+            wallet_address = position['wallet_address'].lower()
+            position_key = f"{wallet_address}:{condition_id}:{position['outcome']}"
+            # HSETNX makes the aggregate update happen once per position
+            if not self.client.hsetnx(self._key('settled_positions'), position_key, json.dumps(position)):
+                continue
+            stats_key = self._key('wallet_stats', wallet_address)
+            pipe = self.client.pipeline()
+            pipe.sadd(self._key('settled', wallet_address), condition_id)
+            pipe.hset(stats_key, 'wallet_label', position.get('wallet_label') or '')
+            pipe.hincrby(stats_key, 'positions', 1)
+            pipe.hincrby(stats_key, 'wins', int(position['pnl'] > 0))
+            for field in ('shares', 'payout', 'pnl'):
+                pipe.hincrbyfloat(stats_key, field, position[field])
+            pipe.hincrbyfloat(stats_key, 'volume', position['cost'])
+            pipe.execute()
+
+    def wallet_stats(self):
+        prefix = self._key('wallet_stats', '')
+        results = []
+        for key in self.client.scan_iter(match=prefix + '*'):
+            raw = self.client.hgetall(key)
+            results.append(wallet_performance({
+                'wallet_address': key[len(prefix):],
+                'wallet_label': raw.get('wallet_label'),
+                'positions': int(raw.get('positions', 0)),
+                'wins': int(raw.get('wins', 0)),
+                'volume': float(raw.get('volume', 0)),
+                'shares': float(raw.get('shares', 0)),
+                'payout': float(raw.get('payout', 0)),
+                'pnl': float(raw.get('pnl', 0))
+            }))
+        return results
+
+def open_store(url=STORE_URL):
+    """Open the shared store - redis:// or rediss:// URLs use Redis, anything else is a sqlite path"""
+    if url.startswith(('redis://', 'rediss://')):
+        return RedisStore(url)
+    return SQLiteStore(url)